@@ -3,6 +3,10 @@ ASGI config for food_ordering project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The async views (the menu and cart JSON APIs and the live order status
+stream in orders.order_stream) need it: under WSGI every open event stream
+holds a worker thread. Run it with e.g. ``uvicorn food_ordering.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -105,6 +105,42 @@ DATABASES = {
 }
 
 
+# Cache
+# Both caches are file based so every worker on the box shares them (the menu
+# version key, cart counters) without an external cache service; MAX_ENTRIES
+# bounds their size.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'menu': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'menu'),
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
+}
+
+
+# Cart storage for signed-in users: 'orders.cart.DatabaseCart' (CartItem rows) or
+# 'orders.cart.SessionCart' (session only; pair it with a signed_cookies or cache
+# SESSION_ENGINE to keep cart traffic off the database). Anonymous visitors
+# always use the session cart.
+
+CART_BACKEND = 'orders.cart.DatabaseCart'
+
+# Seconds a customer has to cancel a new order (stored per order, see orders.cancellation)
+
+ORDER_CANCEL_WINDOW = 120
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -142,6 +178,10 @@ USE_TZ = True
 STATIC_URL = 'static/'
 MEDIA_ROOT = os.path.join(BASE_DIR,'media')
 MEDIA_URL = '/media/'
+# Media is served by orders.media_serving. Behind nginx set MEDIA_OFFLOAD = 'x-accel-redirect' (with an
+# internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT); behind Apache use 'x-sendfile'
+MEDIA_OFFLOAD = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -1,15 +1,14 @@
 from django.contrib import admin
 from django.urls import path,include
-from django.conf.urls.static import static
 from django.conf import settings
+from orders.media_serving import serve_media
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
     path('', include('orders.urls')),
-    path('v2/', include('orders_v2.urls'))
-
+    path('v2/', include('orders_v2.urls')),
+    # Public media only (dish images, the logo); served in production too, set MEDIA_OFFLOAD to hand the bytes to the front proxy
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", serve_media, name='media'),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,7 +1,37 @@
 from django.contrib import admin
 from .models import *
 # Register your models here.
-admin.site.register(Order)
 admin.site.register(OrderHistory)
 admin.site.register(Category)
-admin.site.register(FoodItem)
\ No newline at end of file
+admin.site.register(FoodItem)
+admin.site.register(MenuImportJob)
+
+
+class OrderEventInline(admin.TabularInline):
+    """
+    The audit trail is append-only: shown on its order, written by orders.lifecycle only.
+    Not registered on its own, so deleting an order (or its user) still cascades to it.
+    """
+    model = OrderEvent
+    fields = readonly_fields = ('from_status', 'to_status', 'version', 'actor', 'created_at')
+    ordering = ('version',)
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    # Status changes go through orders.lifecycle (the kitchen screen and status API), which
+    # checks the transition, bumps `version` and records an OrderEvent; the admin cannot
+    list_display = ('id', 'user', 'status', 'total_amount', 'created_at')
+    list_filter = ('status',)
+    readonly_fields = ('status', 'version')
+    inlines = [OrderEventInline]
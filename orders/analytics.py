@@ -0,0 +1,184 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import ItemSalesRollup, Order, OrderEvent, OrderHistory, RollupState, SalesRollup
+
+ROLLUP_STATE_NAME = "sales"
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+# Orders commit a little after their created_at; every run looks this far behind the last watermark
+SETTLE_MARGIN = timedelta(minutes=5)
+TOP_ITEMS = 10
+
+
+def spans(buckets, step):
+    """Merge sorted bucket starts into [start, end) ranges of consecutive buckets."""
+    ranges = []
+    for bucket in buckets:
+        if ranges and ranges[-1][1] == bucket:
+            ranges[-1][1] = bucket + step
+        else:
+            ranges.append([bucket, bucket + step])
+    return [tuple(span) for span in ranges]
+
+
+def local_day(moment):
+    return timezone.localtime(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def dirty_hours(since=None):
+    """
+    Hour buckets holding an order placed, or moved through orders.lifecycle,
+    at or after `since` (every hour with orders when `since` is None).
+    Both lookups run off indexes on created_at.
+    """
+    orders = Order.objects.all()
+    if since is not None:
+        changed = OrderEvent.objects.filter(created_at__gte=since).values('order_id')
+        orders = orders.filter(Q(created_at__gte=since) | Q(id__in=changed))
+    hours = orders.annotate(bucket=TruncHour('created_at')).order_by().values_list('bucket', flat=True).distinct()
+    return sorted(set(hours))
+
+
+def replace_rollups(period, start, end, sales_rows, line_rows):
+    """
+    Swap the `period` rollups of [start, end) for freshly aggregated rows in
+    one transaction. Rows carry a `bucket` plus orders/cancelled/sales
+    (sales_rows) or the line snapshot plus units/sales (line_rows).
+    """
+    items_sold = Counter()
+    item_rollups = []
+    for row in line_rows:
+        items_sold[row['bucket']] += row['units']
+        item_rollups.append(ItemSalesRollup(
+            period=period,
+            bucket_start=row['bucket'],
+            item_id=row['item_id'],
+            item_name=row['item_name'],
+            category_name=row['category_name'],
+            quantity=row['units'],
+            revenue=row['sales'],
+        ))
+    sales_rollups = [SalesRollup(
+        period=period,
+        bucket_start=row['bucket'],
+        order_count=row['orders'],
+        cancelled_count=row['cancelled'],
+        items_sold=items_sold[row['bucket']],
+        revenue=row['sales'] or 0,
+    ) for row in sales_rows]
+
+    with transaction.atomic():
+        SalesRollup.objects.filter(period=period, bucket_start__gte=start, bucket_start__lt=end).delete()
+        ItemSalesRollup.objects.filter(period=period, bucket_start__gte=start, bucket_start__lt=end).delete()
+        SalesRollup.objects.bulk_create(sales_rollups)
+        ItemSalesRollup.objects.bulk_create(item_rollups, batch_size=1000)
+
+
+def rollup_hours(start, end):
+    """Rebuild the hourly rollups of [start, end) from the orders: 2 grouped queries."""
+    sales = (
+        Order.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(bucket=TruncHour('created_at'))
+        .values('bucket')
+        .annotate(
+            orders=Count('id'),
+            cancelled=Count('id', filter=Q(status='Cancelled')),
+            sales=Sum('total_amount', filter=~Q(status='Cancelled')),
+        )
+    )
+    line_total = F('quantity') * F('unit_price')
+    lines = (
+        OrderHistory.objects.filter(order__created_at__gte=start, order__created_at__lt=end)
+        .exclude(order__status='Cancelled')
+        .annotate(bucket=TruncHour('order__created_at'))
+        .values('bucket', 'item_id', 'item_name', 'category_name')
+        .annotate(units=Sum('quantity'), sales=Sum(line_total, output_field=DecimalField(max_digits=12, decimal_places=2)))
+    )
+    replace_rollups('hour', start, end, sales, lines)
+
+
+def rollup_days(start, end):
+    """Rebuild the daily rollups of [start, end) by summing their hourly rollups."""
+    hours = {'period': 'hour', 'bucket_start__gte': start, 'bucket_start__lt': end}
+    sales = (
+        SalesRollup.objects.filter(**hours)
+        .annotate(bucket=TruncDay('bucket_start'))
+        .values('bucket')
+        .annotate(orders=Sum('order_count'), cancelled=Sum('cancelled_count'), sales=Sum('revenue'))
+    )
+    lines = (
+        ItemSalesRollup.objects.filter(**hours)
+        .annotate(bucket=TruncDay('bucket_start'))
+        .values('bucket', 'item_id', 'item_name', 'category_name')
+        .annotate(units=Sum('quantity'), sales=Sum('revenue'))
+    )
+    replace_rollups('day', start, end, sales, lines)
+
+
+def refresh_rollups(full=False):
+    """
+    Bring the rollups up to date. Only hours with orders placed or changed
+    since the last run (and the days holding them) are recomputed, so a
+    run costs the same whatever the total order volume. `full` rebuilds
+    everything, e.g. after orders were deleted. Returns (hours, days).
+    """
+    started = timezone.now()
+    state = RollupState.objects.filter(name=ROLLUP_STATE_NAME).first()
+    since = None if full or state is None else state.watermark - SETTLE_MARGIN
+
+    if full:
+        SalesRollup.objects.all().delete()
+        ItemSalesRollup.objects.all().delete()
+
+    hours = dirty_hours(since)
+    for start, end in spans(hours, HOUR):
+        rollup_hours(start, end)
+    days = sorted({local_day(hour) for hour in hours})
+    for start, end in spans(days, DAY):
+        rollup_days(start, end)
+
+    RollupState.objects.update_or_create(name=ROLLUP_STATE_NAME, defaults={'watermark': started})
+    return len(hours), len(days)
+
+
+def cancellation_rate(order_count, cancelled_count):
+    return cancelled_count / order_count if order_count else 0
+
+
+def sales_report(period, start, end):
+    """Everything the dashboard shows for [start, end), read from the rollup tables only."""
+    sales = SalesRollup.objects.filter(period=period, bucket_start__gte=start, bucket_start__lt=end)
+    items = ItemSalesRollup.objects.filter(period=period, bucket_start__gte=start, bucket_start__lt=end)
+
+    totals = sales.aggregate(
+        order_count=Sum('order_count'), cancelled_count=Sum('cancelled_count'),
+        items_sold=Sum('items_sold'), revenue=Sum('revenue'),
+    )
+    totals = {key: value or 0 for key, value in totals.items()}
+    totals['cancellation_rate'] = cancellation_rate(totals['order_count'], totals['cancelled_count'])
+
+    buckets = list(sales.order_by('bucket_start'))
+    for bucket in buckets:
+        bucket.cancellation_rate = cancellation_rate(bucket.order_count, bucket.cancelled_count)
+
+    return {
+        'totals': totals,
+        'buckets': buckets,
+        'top_items': list(
+            items.values('item_name', 'category_name')
+            .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-quantity', 'item_name')[:TOP_ITEMS]
+        ),
+        'categories': list(
+            items.values('category_name')
+            .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-revenue', 'category_name')
+        ),
+        'refreshed_until': RollupState.objects.filter(name=ROLLUP_STATE_NAME).values_list('watermark', flat=True).first(),
+    }
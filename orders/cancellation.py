@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from .lifecycle import record_event
+from .models import Order
+from .order_stream import publish_status
+
+DEFAULT_CANCEL_WINDOW = 120  # Seconds; settings.ORDER_CANCEL_WINDOW overrides it
+CANCELLABLE_STATUS = 'Pending'
+
+
+def cancel_deadline(window=None, placed_at=None):
+    """When an order placed at `placed_at` (default: now) stops being cancellable."""
+    if window is None:
+        window = getattr(settings, 'ORDER_CANCEL_WINDOW', DEFAULT_CANCEL_WINDOW)
+    return (placed_at or now()) + timedelta(seconds=window)
+
+
+def cancel_order(order_id, user=None):
+    """
+    Cancel an order with one conditional UPDATE:
+
+        UPDATE orders_order SET status = 'Cancelled', version = version + 1
+        WHERE id = %s AND status = 'Pending' AND cancellable_until >= now
+
+    Whoever else changes the order at the same moment (the kitchen
+    completing it, a second cancel) either commits first and the WHERE no
+    longer matches, or waits on the row lock and then finds it Cancelled,
+    so exactly one of them wins. The status guard does the job of the
+    version check in orders.lifecycle.transition, so no read comes first.
+    Returns (won, order): the order is re-read after the UPDATE (None if it
+    does not exist or is not `user`'s) so a loser can tell why.
+    """
+    orders = Order.objects.filter(id=order_id)
+    if user is not None:
+        orders = orders.filter(user=user)
+
+    with transaction.atomic():
+        won = orders.filter(status=CANCELLABLE_STATUS, cancellable_until__gte=now()).update(
+            status='Cancelled', version=F('version') + 1
+        ) == 1
+        order = orders.first()  # Still row-locked by the UPDATE when it won, so this is our version
+        if won:
+            record_event(order, CANCELLABLE_STATUS, user)
+    if won:
+        publish_status(order)  # update() skips the post_save signal that feeds the status stream
+    return won, order
+
+
+def refusal_reason(order):
+    """Why cancel_order lost for `order` (as re-read after the attempt)."""
+    if order is None:
+        return "No such order to cancel."
+    if order.status == 'Cancelled':
+        return "This order is already cancelled."
+    if order.status != CANCELLABLE_STATUS:
+        return f"This order is already {order.status.lower()} and can no longer be cancelled."
+    return "Order cancellation time has expired."
@@ -0,0 +1,283 @@
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Window
+from django.utils.module_loading import import_string
+
+from .models import CartItem, FoodItem
+
+DEFAULT_CART_BACKEND = 'orders.cart.DatabaseCart'
+CART_COUNT_TIMEOUT = 60 * 5
+SESSION_CART_KEY = 'cart'
+
+
+def cart_count_key(user_id):
+    return f"cart:count:{user_id}"
+
+
+def forget_cart_counts(user_ids):
+    """Drop the cached line counts of these users' carts, e.g. once a menu delete cascaded into them."""
+    cache.delete_many([cart_count_key(user_id) for user_id in user_ids])
+
+
+def get_cart(request):
+    """
+    The cart for this request. Anonymous visitors always get a SessionCart;
+    signed-in users get settings.CART_BACKEND (DatabaseCart by default).
+    """
+    if not request.user.is_authenticated:
+        return SessionCart(request)
+    return cart_backend()(request)
+
+
+async def aget_cart(request):
+    """get_cart for async views; resolving the lazy request.user (session and user queries) runs off the event loop."""
+    is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not is_authenticated:
+        return SessionCart(request)
+    return cart_backend()(request)
+
+
+def cart_backend():
+    return import_string(getattr(settings, 'CART_BACKEND', DEFAULT_CART_BACKEND))
+
+
+class CartLine:
+    """One dish in a cart, whichever backend it came from."""
+
+    def __init__(self, food_item, quantity, cart_item_id=None):
+        self.food_item = food_item
+        self.quantity = quantity
+        self.cart_item_id = cart_item_id
+
+    @property
+    def id(self):
+        # Lines are addressed by food item: both backends hold at most one line per dish
+        return self.food_item.id
+
+    def total_price(self):
+        return self.quantity * self.food_item.price
+
+
+class BaseCart:
+    """
+    Cart storage API. Backends keep {food item: quantity}; the cart only becomes
+    Order/OrderHistory rows in place_order.
+    """
+
+    def __init__(self, request, user=None):
+        self.request = request
+        self.user = user or request.user
+
+    def add(self, food_item_id, quantity):
+        """Add `quantity` of a dish and return the number of lines in the cart."""
+        raise NotImplementedError
+
+    def remove(self, food_item_id):
+        raise NotImplementedError
+
+    def items(self):
+        """{food item id: quantity}, without touching the menu tables."""
+        raise NotImplementedError
+
+    def lines(self, for_update=False):
+        """CartLines with their food items (and categories) loaded in one query."""
+        raise NotImplementedError
+
+    def clear(self, lines=None):
+        """Empty the cart, or just `lines` (as returned by lines()) when given."""
+        raise NotImplementedError
+
+    def set_quantity(self, food_item_id, quantity):
+        """Change the quantity of a dish already in the cart; returns False if it is not there."""
+        raise NotImplementedError
+
+    def summary(self):
+        """
+        What the cart page and the JSON cart API show:
+        {"lines": [{"food_item_id", "name", "price", "quantity", "line_total"}], "total_amount", "cart_count"}
+        """
+        raise NotImplementedError
+
+    def count(self):
+        return len(self.items())
+
+    # Async API for the async views. Defaults run the sync method in a worker thread
+    # (sessions have no async interface); backends override what the async ORM can do natively.
+
+    async def aadd(self, food_item_id, quantity):
+        return await sync_to_async(self.add)(food_item_id, quantity)
+
+    async def asummary(self):
+        return await sync_to_async(self.summary)()
+
+
+def build_summary(lines, total_amount=None):
+    if total_amount is None:
+        total_amount = sum((line["line_total"] for line in lines), Decimal("0.00"))
+    return {"lines": lines, "total_amount": total_amount, "cart_count": len(lines)}
+
+
+class DatabaseCart(BaseCart):
+    """Cart lines stored as CartItem rows."""
+
+    def count_key(self):
+        return cart_count_key(self.user.pk)
+
+    def upsert_sql(self):
+        """
+        One INSERT that adds `quantity` to the user's existing line, or creates it,
+        and tells which of the two happened. Relies on the unique (user, food_item)
+        constraint on CartItem.
+        """
+        table = connection.ops.quote_name(CartItem._meta.db_table)
+        insert = f"INSERT INTO {table} (user_id, food_item_id, quantity) VALUES (%s, %s, %s)"
+        if connection.vendor == 'mysql':
+            return f"{insert} ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)"
+        upsert = f"{insert} ON CONFLICT (user_id, food_item_id) DO UPDATE SET quantity = {table}.quantity + excluded.quantity"
+        if connection.vendor == 'postgresql':
+            return f"{upsert} RETURNING (xmax = 0)"  # xmax is only set on a row version written by the UPDATE
+        return f"{upsert} RETURNING quantity"
+
+    def add(self, food_item_id, quantity):
+        """
+        A single atomic upsert, so concurrent adds cannot lose increments.
+        The line count is kept with it: adding more of a dish already in the
+        cart leaves the cached count as it was, a new line increments it, and
+        removals, checkouts and menu deletes (orders.signals) drop it. Once
+        the count is cached an add is this one statement.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(self.upsert_sql(), [self.user.pk, food_item_id, quantity])
+            if connection.vendor == 'mysql':
+                # ON DUPLICATE KEY UPDATE reports 1 affected row for an insert, 2 for an update
+                created = cursor.rowcount == 1
+            elif connection.vendor == 'postgresql':
+                created = cursor.fetchone()[0]
+            else:
+                # Exact: stored quantities are never below 1, so an update returns more than `quantity`
+                created = cursor.fetchone()[0] == quantity
+
+        if created:
+            try:
+                return cache.incr(self.count_key())
+            except ValueError:
+                pass  # Not cached (or expired): count() reads it from the database
+        return self.count()
+
+    def remove(self, food_item_id):
+        CartItem.objects.filter(user=self.user, food_item_id=food_item_id).delete()
+        cache.delete(self.count_key())
+
+    def items(self):
+        return dict(CartItem.objects.filter(user=self.user).values_list('food_item_id', 'quantity'))
+
+    def count(self):
+        count = cache.get(self.count_key())
+        if count is None:
+            count = CartItem.objects.filter(user=self.user).count()
+            cache.set(self.count_key(), count, CART_COUNT_TIMEOUT)
+        return count
+
+    def lines(self, for_update=False):
+        cart_items = CartItem.objects.filter(user=self.user).select_related('food_item__category').order_by('id')
+        if for_update:
+            # Locks the cart rows until the surrounding transaction ends (stops a double checkout)
+            cart_items = cart_items.select_for_update(of=('self',))
+        return [CartLine(item.food_item, item.quantity, item.id) for item in cart_items]
+
+    def clear(self, lines=None):
+        cart_items = CartItem.objects.filter(user=self.user)
+        if lines is not None:
+            # Leave anything added after `lines` were read untouched
+            cart_items = cart_items.filter(id__in=[line.cart_item_id for line in lines])
+        cart_items.delete()
+        cache.delete(self.count_key())
+
+    def set_quantity(self, food_item_id, quantity):
+        return CartItem.objects.filter(user=self.user, food_item_id=food_item_id).update(quantity=quantity) > 0
+
+    def summary_rows(self):
+        """Line totals and the grand total from one query (the total via a window SUM)."""
+        line_total = ExpressionWrapper(F('quantity') * F('food_item__price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+        return (
+            CartItem.objects.filter(user=self.user)
+            .annotate(line_total=line_total, grand_total=Window(Sum(line_total)))
+            .order_by('id')
+            .values('food_item_id', 'food_item__name', 'food_item__price', 'quantity', 'line_total', 'grand_total')
+        )
+
+    def summary(self):
+        return self.summary_from_rows(list(self.summary_rows()))
+
+    async def asummary(self):
+        return self.summary_from_rows([row async for row in self.summary_rows()])
+
+    def summary_from_rows(self, rows):
+        lines = [{
+            "food_item_id": row["food_item_id"],
+            "name": row["food_item__name"],
+            "price": row["food_item__price"],
+            "quantity": row["quantity"],
+            "line_total": row["line_total"],
+        } for row in rows]
+        return build_summary(lines, rows[0]["grand_total"] if lines else None)
+
+
+class SessionCart(BaseCart):
+    """
+    Cart kept in the session as {food item id: quantity}. Adding and removing
+    never touch the orders tables; with SESSION_ENGINE set to signed_cookies
+    (or cache) they do not touch the database at all.
+    """
+
+    def items(self):
+        return {int(food_item_id): quantity for food_item_id, quantity in self.request.session.get(SESSION_CART_KEY, {}).items()}
+
+    def save(self, items):
+        # Session data is JSON serialized, so keys are stored as strings
+        self.request.session[SESSION_CART_KEY] = {str(food_item_id): quantity for food_item_id, quantity in items.items()}
+
+    def add(self, food_item_id, quantity):
+        items = self.items()
+        items[food_item_id] = items.get(food_item_id, 0) + quantity
+        self.save(items)
+        return len(items)
+
+    def remove(self, food_item_id):
+        items = self.items()
+        if items.pop(food_item_id, None) is not None:
+            self.save(items)
+
+    def lines(self, for_update=False):
+        items = self.items()
+        food_items = FoodItem.objects.select_related('category').in_bulk(list(items))
+        # Dishes deleted from the menu since they were added simply drop out
+        return [CartLine(food_items[food_item_id], quantity) for food_item_id, quantity in items.items() if food_item_id in food_items]
+
+    def clear(self, lines=None):
+        items = self.items() if lines is not None else {}
+        for line in lines or []:
+            items.pop(line.food_item.id, None)
+        self.save(items)
+
+    def set_quantity(self, food_item_id, quantity):
+        items = self.items()
+        if food_item_id not in items:
+            return False
+        items[food_item_id] = quantity
+        self.save(items)
+        return True
+
+    def summary(self):
+        lines = [{
+            "food_item_id": line.food_item.id,
+            "name": line.food_item.name,
+            "price": line.food_item.price,
+            "quantity": line.quantity,
+            "line_total": line.total_price(),
+        } for line in self.lines()]
+        return build_summary(lines)
@@ -0,0 +1,54 @@
+import os
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.comments import Comment
+from openpyxl.styles import PatternFill
+
+ERROR_HIGHLIGHT = PatternFill(start_color="FF9999", end_color="FF9999", fill_type="solid")
+
+
+class ErrorWorkbook:
+    """
+    Error report for one menu import, written in openpyxl write-only mode.
+
+    Only the failing rows are added, each with its source row number, and every
+    bad cell is highlighted with the error as a cell comment. Rows are streamed
+    out as they are added; what stays in memory is the comments, so the cost
+    follows the number of errors, not the size of the upload.
+    """
+
+    def __init__(self, header, missing_columns=(), extra_columns=()):
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("Errors")
+        self.header = list(header)
+        self.positions = {name: position for position, name in enumerate(self.header)}
+        self.rows = 0
+
+        cells = [self.cell("Row")]
+        for name in self.header:
+            message = "Unexpected column" if name in extra_columns else None
+            cells.append(self.cell(name, message))
+        for name in missing_columns:
+            cells.append(self.cell(name, "Missing column"))
+        self.sheet.append(cells)
+
+    def cell(self, value, message=None):
+        cell = WriteOnlyCell(self.sheet, value=value)
+        if message:
+            cell.fill = ERROR_HIGHLIGHT
+            cell.comment = Comment(message, "Menu import")
+        return cell
+
+    def add_row(self, row_number, values, errors):
+        """Append a failing source row; `errors` maps column name to message."""
+        cells = [self.cell(row_number)]
+        for name, value in zip(self.header, values):
+            cells.append(self.cell(None if pd.isna(value) else value, errors.get(name)))
+        self.sheet.append(cells)
+        self.rows += 1
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.workbook.save(path)
@@ -0,0 +1,93 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count
+
+from .menu_cache import get_or_build, menu_cache
+from .models import Category, FoodItem
+
+FACETS_KEY = "menu:facets"  # Not versioned: writes adjust it in place instead of dropping it
+FACETS_TIMEOUT = 60 * 10  # Adjustments are read-modify-write, so this bounds drift from racing workers
+
+
+def facet_cell(food_item):
+    return (food_item.category_id, food_item.is_vegan, food_item.is_vegetarian)
+
+
+def build_matrix():
+    """{(category id, is_vegan, is_vegetarian): dishes} from one GROUP BY."""
+    rows = (
+        FoodItem.objects.order_by()
+        .values_list('category_id', 'is_vegan', 'is_vegetarian')
+        .annotate(dishes=Count('id'))
+    )
+    return {(category_id, is_vegan, is_vegetarian): dishes for category_id, is_vegan, is_vegetarian, dishes in rows}
+
+
+def facet_matrix():
+    matrix = menu_cache().get(FACETS_KEY)
+    if matrix is None:
+        matrix = build_matrix()
+        menu_cache().set(FACETS_KEY, matrix, FACETS_TIMEOUT)
+    return matrix
+
+
+def adjust_facets(changes):
+    """Apply {cell: +/- dishes} to the cached matrix once the current transaction commits."""
+    changes = {cell: delta for cell, delta in changes.items() if delta}
+    if not changes:
+        return
+
+    def apply():
+        cache = menu_cache()
+        matrix = cache.get(FACETS_KEY)
+        if matrix is None:
+            return  # Nothing cached; the next read builds it from the table
+        for cell, delta in changes.items():
+            dishes = matrix.get(cell, 0) + delta
+            if dishes > 0:
+                matrix[cell] = dishes
+            else:
+                matrix.pop(cell, None)
+        cache.set(FACETS_KEY, matrix, FACETS_TIMEOUT)
+
+    transaction.on_commit(apply)
+
+
+def record_created(food_items):
+    """Count dishes added without post_save (bulk_create)."""
+    adjust_facets(Counter(facet_cell(food_item) for food_item in food_items))
+
+
+def invalidate_facets():
+    transaction.on_commit(lambda: menu_cache().delete(FACETS_KEY))
+
+
+def category_ids():
+    return get_or_build("category_ids", lambda: dict(Category.objects.values_list('name', 'id')))
+
+
+def facet_counts(category=None, vegan=None, vegetarian=None, matrix=None):
+    """
+    Dish counts for every value of each menu filter, given the other selected
+    filters (a facet never narrows its own counts). `category` is a name;
+    `vegan`/`vegetarian` are True, False or None for "any". No SQL once the
+    matrix is cached.
+    """
+    matrix = facet_matrix() if matrix is None else matrix
+    ids = category_ids()
+    names = {category_id: name for name, category_id in ids.items()}
+    category_id = ids.get(category) if category else None
+
+    counts = {'category': Counter(), 'vegan': Counter(), 'vegetarian': Counter()}
+    for (cell_category, is_vegan, is_vegetarian), dishes in matrix.items():
+        in_category = category is None or cell_category == category_id
+        vegan_ok = vegan is None or is_vegan == vegan
+        vegetarian_ok = vegetarian is None or is_vegetarian == vegetarian
+        if vegan_ok and vegetarian_ok and cell_category in names:
+            counts['category'][names[cell_category]] += dishes
+        if in_category and vegetarian_ok:
+            counts['vegan'][is_vegan] += dishes
+        if in_category and vegan_ok:
+            counts['vegetarian'][is_vegetarian] += dishes
+    return counts
@@ -1,5 +1,7 @@
 import django_filters
 from .models import FoodItem,Category
+from .menu_cache import get_or_build
+from .search import search_menu
 
 # class FoodItemFilter(django_filters.FilterSet):
 #     # category = django_filters.CharFilter(field_name='category__name', lookup_expr='icontains', label='Category')
@@ -16,16 +18,41 @@ from .models import FoodItem,Category
 #         model = FoodItem
 #         fields = ['category', 'name', 'vegetarian', 'vegan']
         
+def category_choices():
+    """Category choices from the menu cache; a Category write bumps the menu version."""
+    return get_or_build(
+        "category_choices",
+        lambda: [(name, name) for name in Category.objects.order_by('name').values_list('name', flat=True)],
+    )
+
 class FoodItemFilter(django_filters.FilterSet):
     category = django_filters.ChoiceFilter(
         field_name='category__name',
-        choices=[(category.name, category.name) for category in Category.objects.all()],
+        choices=category_choices,  # Resolved when the form is built, not at import
         label='Category'
     )
-    name = django_filters.CharFilter(field_name='name', lookup_expr='icontains', label='Search')
+    # Matches name and description, ranked (see orders.search)
+    name = django_filters.CharFilter(method='search', label='Search')
     vegetarian = django_filters.BooleanFilter(field_name='is_vegetarian', label='Vegetarian')
     vegan = django_filters.BooleanFilter(field_name='is_vegan', label='Vegan')
 
+    def search(self, queryset, name, value):
+        return search_menu(queryset, value)
+
+    def show_counts(self, counts):
+        """Add dish counts (from orders.facets.facet_counts) to the filter choices."""
+        category = self.form.fields['category']
+        category.choices = [
+            (value, f"{label} ({counts['category'][value]})" if value else label)
+            for value, label in category.choices
+        ]
+        for name, facet in (('vegetarian', 'vegetarian'), ('vegan', 'vegan')):
+            widget = self.form.fields[name].widget
+            widget.choices = [
+                (value, f"{label} ({counts[facet][value == 'true']})" if value in ('true', 'false') else label)
+                for value, label in widget.choices
+            ]
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if 'category' in self.data:  # Pre-select the category from the URL
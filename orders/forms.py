@@ -18,7 +18,7 @@ class FoodItemForm(forms.ModelForm):
         return cleaned_data
 
 class MenuUploadForm(forms.Form):
-    file = forms.FileField(label="Upload Excel File")
+    file = forms.FileField(label="Upload Excel or CSV File")
 
 class CategoryForm(forms.ModelForm):
     class Meta:
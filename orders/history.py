@@ -0,0 +1,80 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import Order, OrderHistory
+
+HISTORY_PAGE_SIZE = 10
+
+
+def order_statuses():
+    """Statuses in the order they are declared on Order.status (used for tab order)."""
+    return [value for value, _ in Order._meta.get_field('status').choices]
+
+
+def encode_cursor(order):
+    """Keyset cursor pointing just after `order` in (-created_at, -id) order."""
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) for a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def build_history_feed(user, cursors=None, page_size=HISTORY_PAGE_SIZE):
+    """
+    Group a user's orders by status, one keyset-paginated page per status.
+
+    Runs 1 query for the statuses present, 1 per present status for its page
+    and 1 for all order lines, no matter how many orders the user has. Lines
+    are read from their OrderHistory snapshot (name, category and price at
+    checkout), so the menu tables are never touched.
+    """
+    cursors = cursors or {}
+    orders = Order.objects.filter(user=user)
+    present = set(orders.values_list('status', flat=True).distinct())
+
+    groups = []
+    for status in order_statuses():
+        if status not in present:
+            continue
+
+        page = orders.filter(status=status).order_by('-created_at', '-id')
+        position = decode_cursor(cursors.get(status))
+        if position:
+            created_at, order_id = position
+            page = page.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id))
+
+        # Fetch one extra row to know whether an older page exists without a COUNT
+        page = list(page[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+
+        groups.append({
+            'status': status,
+            'orders': page,
+            'next_cursor': encode_cursor(page[-1]) if has_more else None,
+        })
+
+    lines_by_order = {}
+    order_ids = [order.id for group in groups for order in group['orders']]
+    if order_ids:
+        lines = OrderHistory.objects.filter(order_id__in=order_ids).order_by('id')
+        for line in lines:
+            lines_by_order.setdefault(line.order_id, []).append(line)
+
+    for group in groups:
+        for order in group['orders']:
+            order.lines = lines_by_order.get(order.id, [])
+
+    return groups
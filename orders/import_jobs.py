@@ -0,0 +1,124 @@
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils.timezone import now
+
+from .error_report import ErrorWorkbook
+from .menu_import import MenuImporter, MenuImportError
+from .models import MenuImportJob
+
+ERROR_FILE_DIR = "menu_imports/errors"
+STALE_JOB_TIMEOUT = 60 * 60  # Seconds a job may stay Running before a starting worker gives up on it
+
+
+def enqueue_import(upload, user):
+    """Store the upload and queue it; the worker picks it up, so this returns straight away."""
+    return MenuImportJob.objects.create(uploaded_by=user, file=upload, original_name=upload.name)
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest queued job to Running and return it (or None).
+    SKIP LOCKED lets several workers poll the same table without handing out a job twice.
+    """
+    with transaction.atomic():
+        job = (
+            MenuImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status='Queued')
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'Running'
+        job.started_at = now()
+        job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def fail_stale_jobs(timeout=STALE_JOB_TIMEOUT):
+    """
+    Fail jobs left Running by a worker that died mid-import, so their page
+    stops polling. They are not re-queued: the chunks imported before the
+    crash are already committed, and a rerun would report them as duplicates.
+    """
+    return MenuImportJob.objects.filter(status='Running', started_at__lt=now() - timedelta(seconds=timeout)).update(
+        status='Failed',
+        error_message="The import worker stopped before finishing this file. Check the menu and upload the remaining rows again.",
+        finished_at=now(),
+    )
+
+
+def error_file_name(job):
+    """A fresh path per import, so concurrent imports never share (or overwrite) a report."""
+    return f"{ERROR_FILE_DIR}/job_{job.id}_{uuid.uuid4().hex}.xlsx"
+
+
+def save_error_report(job, report):
+    job.error_file = error_file_name(job)
+    report.save(os.path.join(settings.MEDIA_ROOT, job.error_file))
+
+
+def run_job(job):
+    """Import a claimed job's file, recording progress on the job row after every chunk."""
+    report = None
+
+    def progress(result):
+        MenuImportJob.objects.filter(pk=job.pk).update(
+            rows_processed=result.rows_processed,
+            rows_inserted=result.inserted,
+            error_count=result.error_count,
+        )
+
+    def on_error(result, error_row):
+        # Failing rows go straight into the report instead of piling up in memory
+        nonlocal report
+        if report is None:
+            report = ErrorWorkbook(result.header)
+        report.add_row(error_row["row"], error_row["values"], error_row["errors"])
+
+    try:
+        with job.file.open('rb'):
+            result = MenuImporter(progress=progress, on_error=on_error).run(job.file.file, job.original_name)
+    except MenuImportError as e:
+        job.status = 'Failed'
+        job.error_message = str(e)
+        if e.missing_columns or e.extra_columns:
+            job.error_message = (
+                f"Incorrect file format. Missing columns: {', '.join(e.missing_columns)}. "
+                f"Unexpected columns found: {', '.join(e.extra_columns)}"
+            )
+            save_error_report(job, ErrorWorkbook(e.header, e.missing_columns, e.extra_columns))
+    except Exception as e:
+        job.status = 'Failed'
+        job.error_message = f"Error processing file: {str(e)}"
+    else:
+        job.status = 'Completed'
+        job.rows_processed = result.rows_processed
+        job.rows_inserted = result.inserted
+        job.error_count = result.error_count
+        if report is not None:
+            save_error_report(job, report)
+
+    job.finished_at = now()
+    job.save()
+    return job
+
+
+def job_status(job):
+    """JSON-ready progress snapshot for the import page to poll."""
+    return {
+        "id": job.id,
+        "file": job.original_name,
+        "status": job.status,
+        "rows_processed": job.rows_processed,
+        "rows_inserted": job.rows_inserted,
+        "error_count": job.error_count,
+        "error_message": job.error_message,
+        "error_file": reverse("orders:import_job_errors", args=[job.id]) if job.error_file else None,
+        "finished": job.status in ('Completed', 'Failed'),
+    }
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Order, OrderHistory
+
+# Ready orders stay on the screen until they are handed over (Ready -> Completed)
+QUEUE_STATUSES = ('Pending', 'Preparing', 'Ready')
+QUEUE_LIMIT = 200  # A screenful and then some; older open orders show up as those are served
+QUEUE_VERSION_KEY = "kitchen:queue-version"
+LONG_POLL_TIMEOUT = 25  # Seconds a queue request waits for a change (below common proxy timeouts)
+LONG_POLL_INTERVAL = 0.5
+
+
+def open_orders(limit=QUEUE_LIMIT):
+    """
+    Oldest-first orders the kitchen still has to work on or hand over. Served from the
+    (status, created_at) index: however many completed orders pile up, the
+    query only reads the index ranges of the open statuses.
+    """
+    return Order.objects.filter(status__in=QUEUE_STATUSES).select_related('user').order_by('created_at', 'id')[:limit]
+
+
+def build_queue(limit=QUEUE_LIMIT):
+    """The kitchen queue as JSON-ready dicts: 1 query for the orders, 1 for all their lines."""
+    orders = list(open_orders(limit))
+    lines_by_order = {}
+    if orders:
+        lines = OrderHistory.objects.filter(order_id__in=[order.id for order in orders]).order_by('id')
+        for order_id, name, quantity in lines.values_list('order_id', 'item_name', 'quantity'):
+            lines_by_order.setdefault(order_id, []).append({"name": name, "quantity": quantity})
+
+    return [{
+        "id": order.id,
+        "status": order.status,
+        "version": order.version,
+        "customer": order.user.username,
+        "created_at": order.created_at.isoformat(),
+        "total_amount": str(order.total_amount),
+        "lines": lines_by_order.get(order.id, []),
+    } for order in orders]
+
+
+def bump_queue_version():
+    """Tell waiting kitchen screens that an order was placed or changed status."""
+    transaction.on_commit(lambda: cache.set(QUEUE_VERSION_KEY, time.time_ns(), None))
+
+
+def queue_version():
+    version = cache.get(QUEUE_VERSION_KEY)
+    if version is None:
+        cache.add(QUEUE_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(QUEUE_VERSION_KEY)
+    return version
+
+
+async def await_queue_change(since):
+    """
+    Wait (up to LONG_POLL_TIMEOUT) until the queue version differs from
+    `since`; returns the new version, or None if nothing changed. Waiting
+    costs one cache read per LONG_POLL_INTERVAL and no database queries.
+    """
+    deadline = time.monotonic() + LONG_POLL_TIMEOUT
+    while True:
+        version = await cache.aget(QUEUE_VERSION_KEY)
+        if version is not None and str(version) != since:
+            return version
+        if time.monotonic() >= deadline:
+            return None
+        await asyncio.sleep(LONG_POLL_INTERVAL)
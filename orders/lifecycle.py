@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import Order, OrderEvent
+from .order_stream import publish_status
+
+# Allowed moves of Order.status. Completed and Cancelled are final.
+TRANSITIONS = {
+    'Pending': ('Preparing', 'Cancelled'),
+    'Preparing': ('Ready', 'Cancelled'),
+    'Ready': ('Completed',),
+    'Completed': (),
+    'Cancelled': (),
+}
+OPEN_STATUSES = ('Pending', 'Preparing', 'Ready')
+
+
+class TransitionError(Exception):
+    """The order cannot move to the requested status from the one it is in."""
+
+    def __init__(self, message, order=None):
+        super().__init__(message)
+        self.order = order  # The order as it is now, for the caller to show or retry from
+
+
+class StaleOrderError(TransitionError):
+    """Someone else changed the order since the version the caller acted on."""
+
+
+def can_transition(from_status, to_status):
+    return to_status in TRANSITIONS.get(from_status, ())
+
+
+def record_event(order, from_status, actor=None):
+    """Append the transition that produced `order`'s current status and version to its event log."""
+    return OrderEvent.objects.create(
+        order=order, from_status=from_status, to_status=order.status, version=order.version, actor=actor
+    )
+
+
+def transition(order_id, to_status, expected_version=None, actor=None):
+    """
+    Move an order to `to_status` with optimistic locking.
+
+    The order is read without a lock, checked against TRANSITIONS and then
+    written with a compare-and-swap:
+
+        UPDATE orders_order SET status = %s, version = version + 1
+        WHERE id = %s AND version = <version read>
+
+    If anything changed the order in between, no row matches and
+    StaleOrderError is raised; nothing waits on a lock held by another
+    request. Pass the version a client saw as `expected_version` to also
+    refuse acting on a page that is out of date. Returns the updated order.
+    """
+    order = Order.objects.filter(id=order_id).first()
+    if order is None:
+        raise Order.DoesNotExist(f"Order {order_id} does not exist.")
+    if expected_version is not None and order.version != expected_version:
+        raise StaleOrderError(f"Order {order_id} changed since version {expected_version}.", order)
+    if not can_transition(order.status, to_status):
+        raise TransitionError(f"Order {order_id} cannot go from {order.status} to {to_status}.", order)
+
+    from_status = order.status
+    with transaction.atomic():
+        updated = Order.objects.filter(id=order_id, version=order.version).update(
+            status=to_status, version=F('version') + 1
+        )
+        if not updated:
+            raise StaleOrderError(f"Order {order_id} changed while moving it to {to_status}.", Order.objects.filter(id=order_id).first())
+        order.status, order.version = to_status, order.version + 1
+        record_event(order, from_status, actor)
+
+    publish_status(order)  # update() skips the post_save signal that feeds the status stream
+    return order
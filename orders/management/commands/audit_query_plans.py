@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.query_audit import audit
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN every hot query registered in orders.query_audit and fail if any of them needs a full table scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--plans", action="store_true", help="Print the full plan of every query.")
+
+    def handle(self, *args, **options):
+        failures = []
+        for label, plan, scans in audit():
+            if scans:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {label}: {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok         {label}"))
+            if options["plans"] or scans:
+                self.stdout.write(f"    {plan}".replace("\n", "\n    "))
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries fall back to a full table scan.")
@@ -0,0 +1,124 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.test.runner import DiscoverRunner
+from django.utils.timezone import now
+
+from orders.cancellation import cancel_deadline, cancel_order
+from orders.lifecycle import TransitionError, transition
+from orders.models import Order
+
+
+def conditional_cancel(order_id):
+    return cancel_order(order_id)[0]
+
+
+def compare_and_set_prepare(order_id):
+    # The kitchen starting the order: a version-checked transition (orders.lifecycle)
+    try:
+        transition(order_id, 'Preparing')
+    except TransitionError:
+        return False
+    return True
+
+
+def read_modify_write_cancel(order_id):
+    # The old cancel_order: read the row, decide in Python, save the whole row back
+    order = Order.objects.get(id=order_id)
+    if order.status != 'Pending' or order.cancellable_until < now():
+        return False
+    time.sleep(0)  # Let the other thread run between the read and the write, as request handling would
+    order.status = 'Cancelled'
+    order.save()
+    return True
+
+
+def read_modify_write_prepare(order_id):
+    order = Order.objects.get(id=order_id)
+    if order.status != 'Pending':
+        return False
+    time.sleep(0)
+    order.status = 'Preparing'
+    order.save()
+    return True
+
+
+RETRIES = 5
+
+STRATEGIES = [
+    ("conditional update", conditional_cancel, compare_and_set_prepare),
+    ("read-modify-write", read_modify_write_cancel, read_modify_write_prepare),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Race a customer cancel against the kitchen starting every order and count how often both "
+        "sides believe they won (runs against a throwaway test database; use MySQL for meaningful numbers)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8, help="Worker threads (pairs of contenders).")
+
+    def handle(self, *args, **options):
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        databases = runner.setup_databases()
+        try:
+            self.run_benchmark(options["orders"], max(options["concurrency"] // 2, 1))
+        finally:
+            runner.teardown_databases(databases)
+            runner.teardown_test_environment()
+
+    def run_benchmark(self, order_count, pairs):
+        user = User.objects.create_user(username="bench-cancel", password="secret")
+        if connection.vendor == "sqlite":
+            self.stderr.write("SQLite serializes all writers; contention results only mean something on MySQL/PostgreSQL.")
+
+        for label, cancel, prepare in STRATEGIES:
+            orders = Order.objects.bulk_create(
+                Order(user=user, status='Pending', total_amount=10, cancellable_until=cancel_deadline())
+                for _ in range(order_count)
+            )
+            order_ids = [order.id for order in orders]
+
+            def race(order_id):
+                # Both contenders start together on their own connection
+                barrier = Barrier(2)
+
+                def contender(action):
+                    barrier.wait()
+                    try:
+                        for attempt in range(RETRIES):
+                            try:
+                                with transaction.atomic():
+                                    return "won" if action(order_id) else "lost"
+                            except OperationalError:  # Lock wait timeout / deadlock: retry like a client would
+                                time.sleep(0.01 * (attempt + 1))
+                        return "error"
+                    finally:
+                        connection.close()
+
+                with ThreadPoolExecutor(max_workers=2) as pair:
+                    results = pair.submit(contender, cancel), pair.submit(contender, prepare)
+                    return tuple(result.result() for result in results)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=pairs) as executor:
+                outcomes = list(executor.map(race, order_ids))
+            elapsed = time.perf_counter() - started
+
+            cancels = sum(cancel_outcome == "won" for cancel_outcome, _ in outcomes)
+            prepared = sum(prepare_outcome == "won" for _, prepare_outcome in outcomes)
+            both = sum(outcome == ("won", "won") for outcome in outcomes)
+            errors = sum("error" in outcome for outcome in outcomes)
+            self.stdout.write(
+                f"{label:<20} {2 * order_count / elapsed:8.1f} attempts/s  "
+                f"cancelled {cancels:5d}  preparing {prepared:5d}  "
+                f"both won (lost update) {both:5d}  errors {errors:5d}"
+            )
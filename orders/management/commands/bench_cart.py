@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orders.models import Category, FoodItem
+
+BACKENDS = [
+    ("database", {"CART_BACKEND": "orders.cart.DatabaseCart"}),
+    ("session", {"CART_BACKEND": "orders.cart.SessionCart"}),
+    ("session+cookie", {
+        "CART_BACKEND": "orders.cart.SessionCart",
+        "SESSION_ENGINE": "django.contrib.sessions.backends.signed_cookies",
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = "Compare add-to-cart requests/sec for each cart backend (runs against a throwaway test database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--items", type=int, default=20, help="Distinct dishes to cycle through.")
+
+    def handle(self, *args, **options):
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        databases = runner.setup_databases()
+        try:
+            self.run_benchmark(options["requests"], options["items"])
+        finally:
+            runner.teardown_databases(databases)
+            runner.teardown_test_environment()
+
+    def run_benchmark(self, requests, item_count):
+        category = Category.objects.create(name="Benchmark")
+        items = [
+            FoodItem.objects.create(name=f"Dish {i}", price=5, description="Benchmark", category=category)
+            for i in range(item_count)
+        ]
+
+        for label, overrides in BACKENDS:
+            with override_settings(**overrides):
+                user = User.objects.create_user(username=f"bench-{label}", password="secret")
+                client = Client()
+                client.force_login(user)
+                urls = [reverse("orders:add_to_cart", args=[item.id]) for item in items]
+
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for i in range(requests):
+                        client.post(urls[i % len(urls)], {"quantity": 1})
+                    elapsed = time.perf_counter() - started
+
+            cart_queries = sum("orders_cartitem" in query["sql"] for query in queries)
+            self.stdout.write(
+                f"{label:<15} {requests / elapsed:8.1f} req/s  "
+                f"{len(queries) / requests:5.2f} queries/request  "
+                f"{cart_queries / requests:5.2f} cart-table queries/request"
+            )
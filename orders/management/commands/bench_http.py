@@ -0,0 +1,79 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ["/api/menu/", "/api/menu/?vegetarian=true", "/api/cart/"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test running deployments and compare throughput and tail latency, e.g. "
+        "gunicorn food_ordering.wsgi on :8000 against uvicorn food_ordering.asgi:application on :8001."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "targets", nargs="+",
+            help="label=base URL pairs, e.g. wsgi=http://127.0.0.1:8000 asgi=http://127.0.0.1:8001",
+        )
+        parser.add_argument("--path", action="append", dest="paths", help=f"Path to request (repeatable). Default: {DEFAULT_PATHS}")
+        parser.add_argument("--concurrency", type=int, action="append", help="Concurrent clients (repeatable). Default: 1, 16, 64")
+        parser.add_argument("--requests", type=int, default=1000, help="Requests per target and concurrency level.")
+        parser.add_argument("--timeout", type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options["targets"]:
+            label, separator, url = target.partition("=")
+            if not separator or not url.startswith(("http://", "https://")):
+                raise CommandError(f"Expected label=http://host:port, got {target!r}")
+            targets.append((label, url.rstrip("/")))
+        paths = options["paths"] or DEFAULT_PATHS
+
+        for concurrency in options["concurrency"] or [1, 16, 64]:
+            for label, base_url in targets:
+                result = self.run_load(base_url, paths, concurrency, options["requests"], options["timeout"])
+                self.stdout.write(f"{label:<8} c={concurrency:<4} {result}")
+
+    def run_load(self, base_url, paths, concurrency, requests, timeout):
+        local = threading.local()
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def fetch(i):
+            # One cookie jar per client thread, like separate browsers (keeps a session cart each)
+            if not hasattr(local, "opener"):
+                local.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+            url = base_url + paths[i % len(paths)]
+            started = time.perf_counter()
+            try:
+                with local.opener.open(url, timeout=timeout) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError) as error:
+                with lock:
+                    errors.append(error)
+                return
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(fetch, range(requests)))
+        elapsed = time.perf_counter() - started
+
+        if not latencies:
+            return f"all {requests} requests failed ({errors[0]})"
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        return (
+            f"{len(latencies) / elapsed:8.1f} req/s  p50 {percentile(0.50):7.1f} ms  "
+            f"p95 {percentile(0.95):7.1f} ms  p99 {percentile(0.99):7.1f} ms  errors {len(errors)}"
+        )
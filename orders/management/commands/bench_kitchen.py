@@ -0,0 +1,61 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.runner import DiscoverRunner
+
+from orders.kitchen import QUEUE_STATUSES, build_queue, open_orders
+from orders.models import Order, OrderHistory
+from orders.query_audit import full_scans
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Time the kitchen queue against a large completed-order history (runs against a throwaway test database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--completed", type=int, default=200_000, help="Historical completed orders to insert.")
+        parser.add_argument("--open", type=int, default=50, help="Pending/Preparing/Ready orders in the queue.")
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **options):
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        databases = runner.setup_databases()
+        try:
+            self.run_benchmark(options["completed"], options["open"], options["repeat"])
+        finally:
+            runner.teardown_databases(databases)
+            runner.teardown_test_environment()
+
+    def run_benchmark(self, completed, open_count, repeat):
+        user = User.objects.create_user(username="bench-kitchen", password="secret")
+        for start in range(0, completed, BATCH_SIZE):
+            Order.objects.bulk_create(
+                Order(user=user, status='Completed', total_amount=10) for _ in range(min(BATCH_SIZE, completed - start))
+            )
+
+        orders = Order.objects.bulk_create(
+            Order(user=user, status=QUEUE_STATUSES[i % len(QUEUE_STATUSES)], total_amount=10) for i in range(open_count)
+        )
+        OrderHistory.objects.bulk_create(
+            OrderHistory(order=order, quantity=1, item_name=f"Dish {line}", category_name="Benchmark", unit_price=5)
+            for order in orders for line in range(3)
+        )
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queue = build_queue()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        self.stdout.write(f"{completed} completed + {open_count} open orders, queue of {len(queue)}")
+        self.stdout.write(
+            f"build_queue  p50 {statistics.median(timings):6.2f} ms  "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:6.2f} ms  max {timings[-1]:6.2f} ms"
+        )
+        scans = full_scans(open_orders())
+        self.stdout.write(f"full scans: {', '.join(scans) if scans else 'none'}")
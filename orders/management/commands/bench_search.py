@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.runner import DiscoverRunner
+
+from orders.models import Category, FoodItem
+from orders.search import search_menu
+
+WORDS = [
+    "spicy", "chicken", "paneer", "tikka", "margherita", "pepperoni", "garlic", "butter", "naan", "biryani",
+    "mushroom", "truffle", "cheese", "burger", "smoked", "grilled", "crispy", "tofu", "mango", "lassi",
+]
+QUERIES = ["chicken", "marg", "spicy paneer", "garlic butter naan", "truffle"]
+
+
+class Command(BaseCommand):
+    help = "Compare menu search latency against the old name__icontains filter (runs against a throwaway test database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=20000)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--keepdb", action="store_true", help="Reuse the test database (and its menu) between runs.")
+
+    def handle(self, *args, **options):
+        runner = DiscoverRunner(verbosity=0, interactive=False, keepdb=options["keepdb"])
+        runner.setup_test_environment()
+        databases = runner.setup_databases()
+        try:
+            self.fill_menu(options["items"])
+            self.run_benchmark(options["repeat"])
+        finally:
+            runner.teardown_databases(databases)
+            runner.teardown_test_environment()
+
+    def fill_menu(self, count):
+        missing = count - FoodItem.objects.count()
+        if missing <= 0:
+            return
+        rng = random.Random(0)
+        Category.objects.bulk_create([Category(name=f"Bench {i}") for i in range(20)], ignore_conflicts=True)
+        categories = list(Category.objects.filter(name__startswith="Bench "))
+        start = FoodItem.objects.count()
+        FoodItem.objects.bulk_create([
+            FoodItem(
+                name=" ".join(rng.sample(WORDS, 3)).title() + f" {start + i}",
+                description=" ".join(rng.sample(WORDS, 8)),
+                price=rng.randint(1, 30),
+                category=rng.choice(categories),
+            )
+            for i in range(missing)
+        ], batch_size=1000)
+
+    def run_benchmark(self, repeat):
+        page = slice(0, 7)  # CategoryMenuView page size + 1
+        variants = [
+            ("icontains", lambda query: FoodItem.objects.filter(name__icontains=query).order_by("name", "id")),
+            ("search", lambda query: search_menu(FoodItem.objects.order_by("name", "id"), query)),
+        ]
+        self.stdout.write(f"{FoodItem.objects.count()} items on {connection.vendor}")
+        for query in QUERIES:
+            for label, build in variants:
+                hits = len(build(query)[page])
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    list(build(query)[page])
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f"{query!r:<22} {label:<10} {hits:>2} hits  "
+                    f"median {timings[len(timings) // 2]:7.2f} ms  p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms"
+                )
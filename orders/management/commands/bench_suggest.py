@@ -0,0 +1,59 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+
+from orders.models import Category, FoodItem
+from orders.views import menu_suggest
+
+WORDS = ["spicy", "chicken", "paneer", "tikka", "margherita", "garlic", "butter", "naan", "mushroom", "truffle"]
+
+
+class Command(BaseCommand):
+    help = "Measure /menu/suggest/ latency per keystroke on a generated menu (runs against a throwaway test database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=20000)
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        databases = runner.setup_databases()
+        try:
+            self.run_benchmark(options["items"], options["requests"])
+        finally:
+            runner.teardown_databases(databases)
+            runner.teardown_test_environment()
+
+    def run_benchmark(self, item_count, requests):
+        rng = random.Random(0)
+        categories = Category.objects.bulk_create([Category(name=f"Bench {i}") for i in range(20)])
+        FoodItem.objects.bulk_create([
+            FoodItem(name=" ".join(rng.sample(WORDS, 3)).title() + f" {i}", description="", price=5, category=rng.choice(categories))
+            for i in range(item_count)
+        ], batch_size=1000)
+
+        factory = RequestFactory()
+        # Every prefix of a few words, as typed one keystroke at a time
+        keystrokes = [word[:length] for word in WORDS for length in range(1, len(word) + 1)]
+        menu_suggest(factory.get("/menu/suggest/", {"q": "x"}))  # Builds this worker's index
+
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(requests):
+                request = factory.get("/menu/suggest/", {"q": keystrokes[i % len(keystrokes)]})
+                started = time.perf_counter()
+                menu_suggest(request)
+                timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        self.stdout.write(
+            f"{item_count} items, {requests} requests: "
+            f"p50 {timings[len(timings) // 2]:.3f} ms  p99 {timings[int(len(timings) * 0.99) - 1]:.3f} ms  "
+            f"{len(queries)} queries"
+        )
@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+
+from orders.models import FoodItem
+from orders.renditions import generate_renditions, has_renditions
+
+
+def render(image_name):
+    # Runs in a pool process; touches storage only, never the database
+    return image_name, len(generate_renditions(image_name))
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail and WebP renditions for existing FoodItem images, several images at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes in the pool.")
+        parser.add_argument("--force", action="store_true", help="Regenerate images that already have renditions.")
+
+    def handle(self, *args, **options):
+        names = sorted(set(
+            FoodItem.objects.exclude(image="").exclude(image__isnull=True).values_list("image", flat=True)
+        ))
+        if not options["force"]:
+            names = [name for name in names if not has_renditions(name)]
+        if not names:
+            self.stdout.write("Every image already has its renditions.")
+            return
+
+        failed = 0
+        # Spawned (not forked) workers start clean, so they never share this process's database connections
+        pool = ProcessPoolExecutor(
+            max_workers=options["workers"], mp_context=multiprocessing.get_context("spawn"), initializer=django.setup
+        )
+        with pool:
+            for future in as_completed([pool.submit(render, name) for name in names]):
+                name, written = future.result()
+                if written:
+                    self.stdout.write(f"{name}: {written} renditions")
+                else:
+                    failed += 1
+                    self.stderr.write(f"{name}: unreadable, skipped")
+
+        self.stdout.write(self.style.SUCCESS(f"{len(names) - failed} of {len(names)} images processed."))
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+
+from orders.menu_cache import bump_menu_version
+from orders.models import FoodItem
+from orders.renditions import delete_renditions, generate_renditions, has_renditions
+from orders.storage import food_image_storage, is_hashed
+
+
+class Command(BaseCommand):
+    help = "Move FoodItem images stored under upload names to content-hashed names, merging identical files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only list what would be moved.")
+        parser.add_argument("--keep-originals", action="store_true", help="Leave the old files in place.")
+        parser.add_argument(
+            "--prune", action="store_true",
+            help="Also delete content-hashed images no dish uses that are past their grace period.",
+        )
+
+    def handle(self, *args, **options):
+        storage = food_image_storage()
+        self.move_legacy_images(storage, options)
+        if options["prune"]:
+            self.prune(storage, options["dry_run"])
+
+    def move_legacy_images(self, storage, options):
+        default = FoodItem._meta.get_field("image").get_default()
+        names = sorted(
+            name for name in set(FoodItem.objects.exclude(image="").exclude(image__isnull=True).values_list("image", flat=True))
+            if name != default and not is_hashed(name)
+        )
+
+        moved, targets = 0, set()
+        for name in names:
+            if not storage.exists(name):
+                self.stderr.write(f"{name}: file missing, skipped")
+                continue
+            if options["dry_run"]:
+                with storage.open(name, "rb") as original:
+                    self.stdout.write(f"{name} -> {storage.hashed_name(name, original)}")
+                continue
+
+            # Copy, repoint, then delete: a failure at any step leaves every row naming a file that exists
+            with storage.open(name, "rb") as original:
+                new_name = storage.save(name, original)  # Returns the existing file for identical bytes
+            rows = FoodItem.objects.filter(image=name).update(image=new_name)
+            if not has_renditions(new_name):
+                generate_renditions(new_name)
+            if not options["keep_originals"]:
+                storage.delete(name)
+                delete_renditions(name)
+
+            moved += 1
+            targets.add(new_name)
+            self.stdout.write(f"{name} -> {new_name} ({rows} dishes)")
+
+        if moved:
+            bump_menu_version()  # update() skips the signals, and cached menu pages hold the old names
+        self.stdout.write(self.style.SUCCESS(f"{moved} images moved into {len(targets)} content-hashed files."))
+
+    def prune(self, storage, dry_run):
+        """Hashed originals left behind by releases that ran inside the grace period."""
+        directory = FoodItem._meta.get_field("image").upload_to.rstrip("/")
+        if not storage.exists(directory):
+            return
+        referenced = set(FoodItem.objects.values_list("image", flat=True))
+        pruned = 0
+        for prefix in storage.listdir(directory)[0]:
+            for filename in storage.listdir(f"{directory}/{prefix}")[1]:
+                name = f"{directory}/{prefix}/{filename}"
+                # Renditions (hash.card.webp) go with their original
+                if filename.count(".") != 1 or not is_hashed(name) or name in referenced or storage.in_grace_period(name):
+                    continue
+                if not dry_run:
+                    storage.delete(name)
+                    delete_renditions(name)
+                pruned += 1
+                self.stdout.write(f"{name}: unused, {'would be ' if dry_run else ''}deleted")
+        self.stdout.write(self.style.SUCCESS(f"{pruned} unused content-hashed images pruned."))
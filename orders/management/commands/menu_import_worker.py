@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from orders.import_jobs import STALE_JOB_TIMEOUT, claim_next_job, fail_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued menu imports. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Process the jobs queued now, then exit.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument(
+            "--stale-after", type=int, default=STALE_JOB_TIMEOUT,
+            help="Fail jobs that have been Running for longer than this many seconds (left by a dead worker).",
+        )
+
+    def handle(self, *args, **options):
+        stale = fail_stale_jobs(options["stale_after"])
+        if stale:
+            self.stdout.write(f"Failed {stale} import(s) abandoned by a stopped worker")
+
+        while True:
+            close_old_connections()  # Long-running process: drop connections the server has timed out
+            job = claim_next_job()
+
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Import {job.id}: {job.original_name}")
+            job = run_job(job)
+            self.stdout.write(
+                f"Import {job.id}: {job.status}, {job.rows_inserted} of {job.rows_processed} rows inserted, "
+                f"{job.error_count} errors"
+            )
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.analytics import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Update the sales rollups behind the analytics dashboard with the hours changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Rebuild every rollup from scratch.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        hours, days = refresh_rollups(full=options["full"])
+        self.stdout.write(f"Refreshed {hours} hourly and {days} daily buckets in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,184 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .storage import food_image_storage, is_hashed_original
+
+# Mutable names are revalidated on every use; the ETag makes that a cheap 304
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+# Staff-only files must not be kept by shared caches
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+# What serve_media hands out to anyone: dish images (with their renditions) and the site logo.
+# Menu import uploads and error reports under menu_imports/ go through staff-only views.
+PUBLIC_MEDIA_PREFIXES = ('food_item_pics/',)
+PUBLIC_MEDIA_FILES = ('restaurant_logo.png',)
+ETAG_TIMEOUT = 60 * 60 * 24
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+OFFLOAD_HEADERS = {'x-accel-redirect': 'X-Accel-Redirect', 'x-sendfile': 'X-Sendfile'}
+
+
+def file_etag(path, stat):
+    """
+    Strong ETag of a media file. Content-hashed originals carry their hash;
+    other files, renditions included (regenerated under the same name), are
+    hashed once per (path, mtime, size) and the result is cached.
+    """
+    if is_hashed_original(path.replace(os.sep, '/')):
+        return quote_etag(os.path.basename(path))  # The hash names the exact bytes
+
+    key = f"media:etag:{hashlib.sha1(path.encode()).hexdigest()}:{stat.st_mtime_ns}:{stat.st_size}"
+    etag = cache.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as media_file:
+            for chunk in iter(lambda: media_file.read(1024 * 1024), b''):
+                digest.update(chunk)
+        etag = quote_etag(digest.hexdigest())
+        cache.set(key, etag, ETAG_TIMEOUT)
+    return etag
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single "bytes=" range, None to send the whole file, or "unsatisfiable"."""
+    match = RANGE.match(header or '')
+    if not match or not any(match.groups()):
+        return None  # Missing, malformed or multi-range: a full 200 response is always allowed
+    first, last = match.groups()
+    if not first:  # bytes=-500: the last 500 bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+class FileRange:
+    """Read-only window over an open file, so FileResponse streams just the requested bytes."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+        self.name = file.name
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def offload_response(path, header, content_type):
+    """Let the front proxy send the file (nginx X-Accel-Redirect, Apache/lighttpd X-Sendfile)."""
+    response = HttpResponse(content_type=content_type)
+    if header == 'X-Accel-Redirect':
+        response[header] = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/') + path
+    else:
+        response[header] = safe_join(settings.MEDIA_ROOT, path)
+    return response
+
+
+def is_public_media(path):
+    """`path` must be normalized first: food_item_pics/../menu_imports/... is not public."""
+    return path in PUBLIC_MEDIA_FILES or path.startswith(PUBLIC_MEDIA_PREFIXES)
+
+
+@require_safe
+def serve_media(request, path):
+    """Public media: anything outside PUBLIC_MEDIA_PREFIXES/PUBLIC_MEDIA_FILES is a 404."""
+    # Everything below (the file read, the offload header) uses the path that was checked
+    path = posixpath.normpath(path)
+    if not is_public_media(path):
+        raise Http404("Media file not found")
+    return media_response(request, path)
+
+
+def media_response(request, path, cache_control=None, filename=None):
+    """
+    The media file at `path` (relative to MEDIA_ROOT) with a strong ETag, 304s
+    for If-None-Match/If-Modified-Since and single byte ranges. The body goes
+    out through FileResponse, which WSGI servers with wsgi.file_wrapper
+    (gunicorn, uWSGI) send with sendfile(). With MEDIA_OFFLOAD set the front
+    proxy sends it instead. Callers check access; `filename` makes it a download.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (OSError, SuspiciousFileOperation):  # safe_join refuses paths outside MEDIA_ROOT
+        raise Http404("Media file not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Media file not found")
+
+    etag = file_etag(full_path, stat)
+    cache_control = cache_control or food_image_storage().cache_control(path) or REVALIDATE_CACHE_CONTROL
+    headers = {'ETag': etag, 'Last-Modified': http_date(stat.st_mtime), 'Cache-Control': cache_control}
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        for name, value in headers.items():
+            not_modified[name] = value
+        return not_modified
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    offload = OFFLOAD_HEADERS.get((getattr(settings, 'MEDIA_OFFLOAD', None) or '').lower())
+    if offload:
+        response = offload_response(path, offload, content_type)
+    else:
+        response = file_response(request, full_path, stat.st_size, etag, content_type)
+    for name, value in headers.items():
+        response[name] = value
+    if filename:
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+def file_response(request, full_path, size, etag, content_type):
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if if_range is None or if_range == etag:  # A stale If-Range gets the whole, current file
+        byte_range = parse_range(request.headers.get('Range'), size)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, status=200 if byte_range is None else 206)
+        start, end = byte_range or (0, size - 1)
+        response['Content-Length'] = end - start + 1
+        if byte_range is not None:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    media_file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(media_file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(FileRange(media_file, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,111 @@
+import hashlib
+import threading
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .search import search_terms
+
+MENU_CACHE_ALIAS = "menu"
+MENU_VERSION_KEY = "menu:version"
+
+_MISSING = object()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def menu_cache():
+    return caches[MENU_CACHE_ALIAS]
+
+
+def get_menu_version():
+    """
+    Current global menu version. Every cached menu entry is keyed on it, so
+    bumping the version makes all older entries unreachable at once.
+    """
+    cache = menu_cache()
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a culled/expired version key never goes back to an old value
+        cache.add(MENU_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+async def aget_menu_version():
+    """get_menu_version for async views."""
+    cache = menu_cache()
+    version = await cache.aget(MENU_VERSION_KEY)
+    if version is None:
+        await cache.aadd(MENU_VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(MENU_VERSION_KEY)
+    return version
+
+
+def bump_menu_version():
+    """Invalidate every cached menu entry once the current transaction commits."""
+    transaction.on_commit(lambda: menu_cache().set(MENU_VERSION_KEY, time.time_ns(), None))
+
+
+def normalize_params(params):
+    """Stable, order-independent form of the filter query params (blank values dropped)."""
+    normalized = []
+    for key in sorted(params.keys()):
+        for value in params.getlist(key) if hasattr(params, "getlist") else [params[key]]:
+            value = str(value).strip()
+            if not value:
+                continue
+            if key == "name":  # Search only sees lowercased words, so case and punctuation do not change the result
+                value = " ".join(search_terms(value))
+            normalized.append((key, value))
+    return normalized
+
+
+def menu_cache_key(name, params=None, version=None):
+    digest = hashlib.sha1(repr(normalize_params(params or {})).encode()).hexdigest()
+    return f"menu:{get_menu_version() if version is None else version}:{name}:{digest}"
+
+
+def record_lookup(hit):
+    with _stats_lock:
+        _stats["hits" if hit else "misses"] += 1
+
+
+def get_or_build(name, build, params=None):
+    """Return the cached value for (menu version, name, params), calling build() on a miss."""
+    cache = menu_cache()
+    key = menu_cache_key(name, params)
+    value = cache.get(key, _MISSING)
+    record_lookup(value is not _MISSING)
+
+    if value is _MISSING:
+        value = build()
+        cache.set(key, value)
+    return value
+
+
+async def aget_or_build(name, build, params=None):
+    """get_or_build for async views; `build` is a coroutine function."""
+    cache = menu_cache()
+    key = menu_cache_key(name, params, await aget_menu_version())
+    value = await cache.aget(key, _MISSING)
+    record_lookup(value is not _MISSING)
+
+    if value is _MISSING:
+        value = await build()
+        await cache.aset(key, value)
+    return value
+
+
+def menu_cache_stats():
+    """Hit/miss counters for this worker process."""
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    lookups = hits + misses
+    return {
+        "version": get_menu_version(),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+    }
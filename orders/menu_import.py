@@ -0,0 +1,234 @@
+import csv
+import io
+import os
+from decimal import Decimal
+from itertools import islice
+
+import pandas as pd
+from django.db import transaction
+from openpyxl import load_workbook
+
+from .facets import record_created
+from .menu_cache import bump_menu_version
+from .models import Category, FoodItem
+
+EXPECTED_COLUMNS = ["Name", "Category", "Price", "Description", "Is_Vegetarian", "Is_Vegan", "Image_Path"]
+TEXT_COLUMNS = ["Name", "Category", "Description"]
+BOOL_COLUMNS = ["Is_Vegetarian", "Is_Vegan"]
+BOOL_VALUES = {"TRUE": True, "FALSE": False, "1": True, "0": False}
+MAX_PRICE = 10 ** 8  # FoodItem.price is DecimalField(max_digits=10, decimal_places=2)
+
+CHUNK_SIZE = 1000
+
+
+class MenuImportError(Exception):
+    """The upload cannot be imported at all (unreadable, empty, or wrong columns)."""
+
+    def __init__(self, message, missing_columns=(), extra_columns=(), header=()):
+        super().__init__(message)
+        self.header = list(header)
+        self.missing_columns = list(missing_columns)
+        self.extra_columns = list(extra_columns)
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows_processed = 0
+        self.inserted = 0
+        self.header = []
+        self.error_count = 0
+        # Failing rows, kept only when the importer has no on_error callback:
+        # {"row": spreadsheet row number, "values": [...], "errors": {column: message}}
+        self.error_rows = []
+
+    @property
+    def has_errors(self):
+        return bool(self.error_count)
+
+
+def iter_rows(file, filename):
+    """Yield the rows of an .xlsx or .csv upload one at a time, header first."""
+    extension = os.path.splitext(filename)[1].lower()
+
+    if extension in (".xlsx", ".xlsm"):
+        # read_only streams the sheet XML instead of building every cell in memory
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    elif extension == ".csv":
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        try:
+            yield from csv.reader(text)
+        finally:
+            text.detach()  # Leave the underlying upload open for its owner
+    else:
+        raise MenuImportError("Unsupported file type. Upload an .xlsx or .csv file.")
+
+
+def iter_chunks(rows, size):
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def is_blank(series):
+    return series.isna() | series.astype(str).str.strip().eq("")
+
+
+def validate_chunk(df):
+    """
+    Type-check a chunk column by column. Returns {row index: {column: message}}
+    for failing rows only, plus the parsed prices and booleans.
+    """
+    errors = {}
+
+    def flag(mask, column, message):
+        for index in df.index[mask]:
+            errors.setdefault(index, {}).setdefault(column, message)
+
+    for column in TEXT_COLUMNS:
+        missing = is_blank(df[column])
+        flag(missing, column, f"{column} is missing")
+        flag(~missing & df[column].map(type).ne(str), column, f"{column} must be str")
+
+    missing = is_blank(df["Price"])
+    prices = pd.to_numeric(df["Price"].where(~missing), errors="coerce")
+    flag(missing, "Price", "Price is missing")
+    flag(~missing & prices.isna(), "Price", "Price must be int or float")
+    flag(prices.lt(0) | prices.ge(MAX_PRICE), "Price", f"Price must be between 0 and {MAX_PRICE}")
+
+    flags = {}
+    for column in BOOL_COLUMNS:
+        missing = is_blank(df[column])
+        flags[column] = df[column].astype(str).str.strip().str.upper().map(BOOL_VALUES)
+        flag(missing, column, f"{column} is missing")
+        flag(~missing & flags[column].isna(), column, f"{column} must be bool")
+
+    return errors, prices, flags
+
+
+class MenuImporter:
+    """
+    Imports a menu spreadsheet in fixed-size chunks so memory stays bounded by
+    CHUNK_SIZE (plus the failing rows) whatever the file size. Each chunk costs
+    one category lookup, one duplicate lookup and one bulk insert.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, progress=None, on_error=None):
+        self.chunk_size = chunk_size
+        self.progress = progress  # Called with the running ImportResult after every chunk
+        self.on_error = on_error  # Called with (result, failing row) instead of keeping the row
+        self.category_ids = {}  # name -> id, grows with the number of categories only
+
+    def run(self, file, filename):
+        result = ImportResult()
+        rows = iter_rows(file, filename)
+
+        header = next(rows, None)
+        if header is None:
+            raise MenuImportError("The uploaded file is empty.")
+        header = [str(name).strip() if name is not None else "" for name in header]
+        while header and not header[-1]:
+            header.pop()
+        result.header = header
+
+        missing_columns = [col for col in EXPECTED_COLUMNS if col not in header]
+        extra_columns = [col for col in header if col not in EXPECTED_COLUMNS]
+        if missing_columns or extra_columns:
+            raise MenuImportError("Incorrect file format.", missing_columns, extra_columns, header)
+
+        first_row = 2  # Spreadsheet row numbers: 1-based plus the header row
+        for chunk in iter_chunks(rows, self.chunk_size):
+            self.import_chunk(chunk, first_row, result)
+            first_row += len(chunk)
+            if self.progress:
+                self.progress(result)
+
+        if not result.rows_processed:
+            raise MenuImportError("The uploaded file is empty.")
+        return result
+
+    def import_chunk(self, chunk, first_row, result):
+        width = len(result.header)
+        records = [(list(row) + [None] * width)[:width] for row in chunk]
+        df = pd.DataFrame(records, columns=result.header, dtype=object)
+        df.index = range(first_row, first_row + len(df))
+        df = df[~df.isna().all(axis=1)]  # Skip blank lines
+        if df.empty:
+            return
+        result.rows_processed += len(df)
+
+        errors, prices, flags = validate_chunk(df)
+        valid = df[~df.index.isin(list(errors))]
+
+        with transaction.atomic():
+            category_ids = self.resolve_categories(valid["Category"].str.strip().unique())
+            existing = self.existing_keys(valid, category_ids)
+
+            new_items, seen = [], set()
+            for index, name, category, description in zip(
+                valid.index, valid["Name"].str.strip(), valid["Category"].str.strip(), valid["Description"]
+            ):
+                is_vegan, is_vegetarian = flags["Is_Vegan"][index], flags["Is_Vegetarian"][index]
+                key = (name.casefold(), category_ids[category], is_vegan, is_vegetarian)
+                if key in existing or key in seen:
+                    errors[index] = {"Name": f"Duplicate entry: {name} in {category}"}
+                    continue
+                seen.add(key)
+                new_items.append(FoodItem(
+                    name=name,
+                    category_id=category_ids[category],
+                    price=Decimal(str(prices[index])).quantize(Decimal("0.01")),
+                    description=description,
+                    is_vegetarian=is_vegetarian,
+                    is_vegan=is_vegan,
+                ))
+
+            if new_items:
+                FoodItem.objects.bulk_create(new_items, batch_size=500)
+                bump_menu_version()  # bulk_create skips the post_save signal
+                record_created(new_items)
+                result.inserted += len(new_items)
+
+        for index in sorted(errors):
+            error_row = {"row": index, "values": list(df.loc[index]), "errors": errors[index]}
+            result.error_count += 1
+            if self.on_error:
+                self.on_error(result, error_row)
+            else:
+                result.error_rows.append(error_row)
+
+    def resolve_categories(self, names):
+        """Map category names to ids, creating the missing ones with one bulk insert."""
+        missing = [name for name in names if name not in self.category_ids]
+        if missing:
+            found = dict(Category.objects.filter(name__in=missing).values_list("name", "id"))
+            to_create = [name for name in missing if name not in found]
+            if to_create:
+                Category.objects.bulk_create([Category(name=name) for name in to_create], ignore_conflicts=True)
+                found.update(Category.objects.filter(name__in=to_create).values_list("name", "id"))
+                bump_menu_version()
+
+            # Case-insensitive collations (MySQL) may hand back a differently cased name
+            folded = {name.casefold(): category_id for name, category_id in found.items()}
+            for name in missing:
+                self.category_ids[name] = found.get(name, folded.get(name.casefold()))
+        return self.category_ids
+
+    def existing_keys(self, valid, category_ids):
+        """(name, category, vegan, vegetarian) keys of this chunk that are already on the menu."""
+        if valid.empty:
+            return set()
+        names = set(valid["Name"].str.strip())
+        ids = {category_ids[name] for name in valid["Category"].str.strip()}
+        return {
+            (name.casefold(), category_id, is_vegan, is_vegetarian)
+            for name, category_id, is_vegan, is_vegetarian in FoodItem.objects.filter(
+                name__in=names, category_id__in=ids
+            ).values_list("name", "category_id", "is_vegan", "is_vegetarian")
+        }
+
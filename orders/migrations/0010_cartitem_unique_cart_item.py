@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:59
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    """Fold duplicate (user, food_item) lines into the oldest one, summing quantities."""
+    CartItem = apps.get_model('orders', 'CartItem')
+    duplicates = (
+        CartItem.objects.values('user_id', 'food_item_id')
+        .annotate(lines=Count('id'), keep_id=Min('id'), total=Sum('quantity'))
+        .filter(lines__gt=1)
+    )
+    for group in duplicates:
+        lines = CartItem.objects.filter(user_id=group['user_id'], food_item_id=group['food_item_id'])
+        lines.filter(id=group['keep_id']).update(quantity=group['total'])
+        lines.exclude(id=group['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_menuimportjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'food_item'), name='unique_cart_item'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def snapshot_order_lines(apps, schema_editor):
+    """Copy today's menu name, category and price onto existing order lines."""
+    FoodItem = apps.get_model('orders', 'FoodItem')
+    OrderHistory = apps.get_model('orders', 'OrderHistory')
+    food_item = FoodItem.objects.filter(pk=OuterRef('item_id'))
+    # One UPDATE with correlated subqueries; older prices were never recorded, so this is the best available
+    OrderHistory.objects.filter(item__isnull=False).update(
+        item_name=Subquery(food_item.values('name')[:1]),
+        category_name=Subquery(food_item.values('category__name')[:1]),
+        unit_price=Subquery(food_item.values('price')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_cartitem_unique_cart_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderhistory',
+            name='category_name',
+            field=models.CharField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='orderhistory',
+            name='item_name',
+            field=models.CharField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='orderhistory',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.RunPython(snapshot_order_lines, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderhistory',
+            name='item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='orders.fooditem'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_orderhistory_price_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fooditem',
+            index=models.Index(fields=['category', 'is_vegan', 'is_vegetarian'], name='fooditem_category_diet_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'status', '-created_at', '-id'], name='order_user_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:24
+
+from django.db import migrations
+
+
+def create_fulltext_index(apps, schema_editor):
+    # Django has no FULLTEXT index type; other databases use the LIKE fallback in orders.search
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('CREATE FULLTEXT INDEX fooditem_search_idx ON orders_fooditem (name, description)')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX fooditem_search_idx ON orders_fooditem')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:35
+
+from django.db import migrations, models
+import orders.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_fooditem_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fooditem',
+            name='image',
+            field=models.ImageField(blank=True, default='food_item_pics/food_default.png', null=True, storage=orders.storage.food_image_storage, upload_to='food_item_pics/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_fooditem_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cancellable_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 import os
 from django.db import models
 from django.contrib.auth.models import User
+from .storage import food_image_storage
 
 class Category(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -19,7 +20,8 @@ class FoodItem(models.Model):
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField()
-    image = models.ImageField(upload_to="food_item_pics/", null=True, blank=True,default="food_item_pics/food_default.png")
+    # Stored under its content hash, shared by dishes with the same picture (see orders.storage)
+    image = models.ImageField(upload_to="food_item_pics/", storage=food_image_storage, null=True, blank=True,default="food_item_pics/food_default.png")
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     is_vegan = models.BooleanField(default=False)
     is_vegetarian = models.BooleanField(default=False)
@@ -33,6 +35,10 @@ class FoodItem(models.Model):
                 name='unique_food_item'
             )
         ]
+        indexes = [
+            # Menu filters: category plus the two diet flags (text search has its own index, see orders.search)
+            models.Index(fields=['category', 'is_vegan', 'is_vegetarian'], name='fooditem_category_diet_idx'),
+        ]
     
 class CartItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -45,12 +51,38 @@ class CartItem(models.Model):
     def __str__(self):
         return f"{self.food_item.name} - {self.quantity}"
 
+    class Meta:
+        constraints = [
+            # One line per dish: adds to the cart upsert into it (see orders.cart.DatabaseCart.add)
+            models.UniqueConstraint(fields=['user', 'food_item'], name='unique_cart_item')
+        ]
+
 
 class Order(models.Model):
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'), ('Preparing', 'Preparing'), ('Ready', 'Ready'),
+        ('Completed', 'Completed'), ('Cancelled', 'Cancelled'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     total_amount = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     created_at = models.DateTimeField(auto_now_add=True)
-    status = models.CharField(max_length=20, choices=[('Pending', 'Pending'), ('Completed', 'Completed'),('Cancelled', 'Cancelled')], default='Pending')
+    # Changed only through orders.lifecycle, which bumps `version` with every transition
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    version = models.PositiveIntegerField(default=0)
+    # End of this order's cancellation window (see orders.cancellation); NULL means it cannot be cancelled
+    cancellable_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Latest order of a user (cancel_order) and one history tab page (orders.history)
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            models.Index(fields=['user', 'status', '-created_at', '-id'], name='order_user_status_created_idx'),
+            # Kitchen queue (orders.kitchen): open statuses oldest first, never touching the completed history
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            # Analytics refresh (orders.analytics): orders placed in a range of hours
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.user.username}"
@@ -58,11 +90,118 @@ class Order(models.Model):
 
 class OrderHistory(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
-    item = models.ForeignKey(FoodItem, on_delete=models.CASCADE)
+    # Kept for reference only: a past order reads the snapshot below, so dishes can leave the menu
+    item = models.ForeignKey(FoodItem, on_delete=models.SET_NULL, null=True, blank=True)
     quantity = models.IntegerField()
+    # Copied from the menu at checkout so later price or name changes never rewrite an order
+    item_name = models.CharField(max_length=255)
+    category_name = models.CharField(max_length=255)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    @classmethod
+    def from_menu(cls, order, food_item, quantity):
+        """An order line snapshotting `food_item` (its category must be loaded)."""
+        return cls(
+            order=order,
+            item=food_item,
+            quantity=quantity,
+            item_name=food_item.name,
+            category_name=food_item.category.name,
+            unit_price=food_item.price,
+        )
+
+    def total_price(self):
+        return self.quantity * self.unit_price
 
     def __str__(self):
-        return f"Order {self.order.id}: {self.quantity} x {self.item.name}"
-    
+        return f"Order {self.order_id}: {self.quantity} x {self.item_name}"
+
+
+class OrderEvent(models.Model):
+    """One status transition of an order, appended by orders.lifecycle and never updated."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    from_status = models.CharField(max_length=20, blank=True)  # Blank for the order being placed
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    version = models.PositiveIntegerField()  # Order.version the transition produced
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # A second writer of the same version would mean a lost update got through
+            models.UniqueConstraint(fields=['order', 'version'], name='unique_order_event_version'),
+        ]
+        # Analytics refresh: orders changed since the last run
+        indexes = [models.Index(fields=['created_at'], name='orderevent_created_idx')]
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status or '-'} -> {self.to_status} (v{self.version})"
+
 
+ROLLUP_PERIODS = [('hour', 'Hour'), ('day', 'Day')]
 
+
+class SalesRollup(models.Model):
+    """Orders placed in one hour or day (see orders.analytics). Cancelled orders count towards nothing but cancelled_count."""
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIODS)
+    bucket_start = models.DateTimeField()
+    order_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    items_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['period', 'bucket_start'], name='unique_sales_rollup')]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket_start:%Y-%m-%d %H:%M}: {self.order_count} orders"
+
+
+class ItemSalesRollup(models.Model):
+    """One dish's sales in one hour or day, keyed on the order line snapshot so deleted dishes keep their history."""
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIODS)
+    bucket_start = models.DateTimeField()
+    item = models.ForeignKey(FoodItem, on_delete=models.SET_NULL, null=True, blank=True)
+    item_name = models.CharField(max_length=255)
+    category_name = models.CharField(max_length=255)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['period', 'bucket_start'], name='itemsalesrollup_bucket_idx')]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket_start:%Y-%m-%d %H:%M}: {self.quantity} x {self.item_name}"
+
+
+class RollupState(models.Model):
+    """How far manage.py refresh_rollups has got: orders placed or changed before `watermark` are rolled up."""
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} up to {self.watermark}"
+
+
+class MenuImportJob(models.Model):
+    """A menu upload waiting for, or processed by, the import worker (manage.py menu_import_worker)."""
+    STATUS_CHOICES = [('Queued', 'Queued'), ('Running', 'Running'), ('Completed', 'Completed'), ('Failed', 'Failed')]
+
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    file = models.FileField(upload_to="menu_imports/")
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Queued')
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_inserted = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    error_file = models.CharField(max_length=255, blank=True)  # Relative to MEDIA_ROOT
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'], name='menuimportjob_queue_idx')]
+
+    def __str__(self):
+        return f"Import {self.id} - {self.original_name} ({self.status})"
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .kitchen import bump_queue_version
+
+STREAM_BUFFER_SIZE = 50  # Events a reconnecting client can catch up on
+STREAM_EVENT_TIMEOUT = 60 * 10  # How long an event stays replayable
+STREAM_POLL_INTERVAL = 1.0  # Seconds between checks for new events on an open stream
+STREAM_KEEPALIVE = 15  # Seconds of silence before a comment line keeps proxies from closing the stream
+STREAM_MAX_DURATION = 60 * 5  # Streams end after this; EventSource reconnects with Last-Event-ID
+STREAM_RETRY_MS = 3000
+
+
+def sequence_key(user_id):
+    return f"order-status:{user_id}:seq"
+
+
+def event_key(user_id, event_id):
+    return f"order-status:{user_id}:{event_id}"
+
+
+def sequence_start():
+    """
+    First id of a user's event sequence: the clock in microseconds, like the
+    menu and queue versions. A counter culled from the cache restarts above
+    every id it handed out, so clients never wait for ids they have already seen.
+    """
+    return time.time_ns() // 1000
+
+
+def publish_status(order):
+    """
+    Append a status change of `order` to its owner's event log once the
+    transaction commits; the replay buffer is the last STREAM_BUFFER_SIZE
+    ids. incr is not atomic on every backend (the file cache reads and then
+    writes), so two publishers can draw the same id: each event key is added
+    rather than set, and the publisher that loses draws the next id. Kitchen
+    screens waiting on the queue are woken up too.
+    """
+    event = {"order_id": order.id, "status": order.status, "total_amount": str(order.total_amount)}
+    user_id = order.user_id
+
+    def publish():
+        cache.add(sequence_key(user_id), sequence_start(), None)
+        while True:
+            event_id = cache.incr(sequence_key(user_id))
+            if cache.add(event_key(user_id, event_id), {"id": event_id, "at": time.time(), **event}, STREAM_EVENT_TIMEOUT):
+                break
+
+    transaction.on_commit(publish)
+    bump_queue_version()
+
+
+def last_event_id(user_id):
+    """Id of the newest event; pages embed it so their stream starts exactly where the render left off."""
+    cache.add(sequence_key(user_id), sequence_start(), None)
+    return cache.get(sequence_key(user_id), 0)
+
+
+async def aevents_after(user_id, after):
+    """
+    Events newer than `after`, oldest first, plus the newest id. Returns
+    None for the events when `after` is older than the replay buffer (or
+    some events expired) or newer than the sequence (it restarted), meaning
+    the client has to reload instead.
+    """
+    newest = await cache.aget(sequence_key(user_id))
+    if newest is None:
+        return [], after  # Culled and nothing published since: the next event restarts it higher
+    if newest == after:
+        return [], newest
+    if newest < after or newest - after > STREAM_BUFFER_SIZE:
+        return None, newest
+    found = await cache.aget_many([event_key(user_id, event_id) for event_id in range(after + 1, newest + 1)])
+    if len(found) < newest - after:
+        return None, newest
+    return [found[event_key(user_id, event_id)] for event_id in range(after + 1, newest + 1)], newest
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: status\ndata: {json.dumps(event)}\n\n"
+
+
+async def status_stream(user_id, after):
+    """
+    Server-sent events for one user's order status changes, starting after
+    event id `after`. Each open stream costs one cache read per
+    STREAM_POLL_INTERVAL and no database queries.
+    """
+    yield f"retry: {STREAM_RETRY_MS}\n\n"
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < STREAM_MAX_DURATION:
+        events, newest = await aevents_after(user_id, after)
+        if events is None:
+            # Too far behind to replay: the page reloads and reconnects from the new id
+            yield f"id: {newest}\nevent: reset\ndata: {{}}\n\n"
+            return
+        for event in events:
+            yield format_event(event)
+        if events:
+            after, last_sent = events[-1]["id"], time.monotonic()
+        elif time.monotonic() - last_sent >= STREAM_KEEPALIVE:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
@@ -0,0 +1,60 @@
+class SeekPage:
+    """
+    A page of results that knows whether another page follows without a COUNT.
+
+    It fetches one row more than the page size; if that row comes back there is
+    a next page. Offers the subset of django.core.paginator.Page the templates use.
+    """
+
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __repr__(self):
+        return f"<Page {self.number}>"
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def parse_page_number(value):
+    """Page numbers are 1-based; anything missing or malformed means the first page."""
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def seek_page(queryset, page_number, per_page):
+    """Return SeekPage `page_number` of `queryset` using a single LIMIT per_page + 1 query."""
+    number = parse_page_number(page_number)
+    offset = (number - 1) * per_page
+    rows = list(queryset[offset:offset + per_page + 1])
+    return SeekPage(rows[:per_page], number, len(rows) > per_page)
+
+
+async def aseek_page(queryset, page_number, per_page):
+    """seek_page for async views, fetched with the async ORM."""
+    number = parse_page_number(page_number)
+    offset = (number - 1) * per_page
+    rows = [row async for row in queryset[offset:offset + per_page + 1]]
+    return SeekPage(rows[:per_page], number, len(rows) > per_page)
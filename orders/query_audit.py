@@ -0,0 +1,85 @@
+import json
+import re
+
+from django.db import connection
+
+from .kitchen import open_orders
+from .models import CartItem, FoodItem, Order, OrderHistory
+from .search import search_menu
+
+# label -> function returning the queryset to EXPLAIN; see manage.py audit_query_plans
+HOT_QUERIES = {}
+
+
+def hot_query(label):
+    """Register a queryset builder whose plan must stay on an index."""
+    def register(build):
+        HOT_QUERIES[label] = build
+        return build
+    return register
+
+
+# Parameter values only shape the plan; the rows do not need to exist
+
+@hot_query("latest order of a user (cancel_order)")
+def latest_order():
+    return Order.objects.filter(user_id=1).order_by('-created_at')[:1]
+
+
+@hot_query("order history tab page (orders.history)")
+def order_history_page():
+    return Order.objects.filter(user_id=1, status='Completed').order_by('-created_at', '-id')[:11]
+
+
+@hot_query("kitchen queue (orders.kitchen)")
+def kitchen_queue():
+    return open_orders()
+
+
+@hot_query("order lines of a history page")
+def order_lines():
+    return OrderHistory.objects.filter(order_id__in=[1, 2, 3]).order_by('id')
+
+
+@hot_query("cart lines of a user")
+def cart_lines():
+    return CartItem.objects.filter(user_id=1).select_related('food_item__category').order_by('id')
+
+
+@hot_query("menu search within a category and diet")
+def menu_by_category():
+    queryset = FoodItem.objects.filter(category__name='Pizza', is_vegan=False, is_vegetarian=True)
+    return search_menu(queryset.select_related('category'), 'cheese')
+
+
+def full_scans(queryset):
+    """Tables the database would read in full for `queryset`, according to EXPLAIN."""
+    if connection.vendor == 'mysql':
+        return mysql_full_scans(json.loads(queryset.explain(format='json')))
+    plan = queryset.explain()
+    if connection.vendor == 'postgresql':
+        return re.findall(r'Seq Scan on (\S+)', plan)
+    # SQLite: "SCAN table" is a full scan, "SCAN table USING INDEX ..." walks an index instead
+    return re.findall(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)\s*$', plan, re.MULTILINE)
+
+
+def mysql_full_scans(plan):
+    tables = []
+    if isinstance(plan, dict):
+        if plan.get('access_type') == 'ALL':
+            tables.append(plan.get('table_name'))
+        for value in plan.values():
+            tables.extend(mysql_full_scans(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            tables.extend(mysql_full_scans(value))
+    return tables
+
+
+def audit():
+    """[(label, plan, full scan tables)] for every registered hot query."""
+    results = []
+    for label, build in HOT_QUERIES.items():
+        queryset = build()
+        results.append((label, queryset.explain(), full_scans(queryset)))
+    return results
@@ -0,0 +1,69 @@
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# name -> (width, height); menu cards show images 200px high, so "card" covers 2x screens
+RENDITIONS = {
+    "thumb": (160, 120),
+    "card": (600, 400),
+}
+# extension -> (Pillow format, save options)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def rendition_name(image_name, size, extension):
+    """food_item_pics/7_Milkshake.jpg -> food_item_pics/7_Milkshake.card.webp"""
+    root, _ = os.path.splitext(image_name)
+    return f"{root}.{size}.{extension}"
+
+
+def rendition_names(image_name):
+    return [rendition_name(image_name, size, extension) for size in RENDITIONS for extension in FORMATS]
+
+
+def has_renditions(image_name, storage=default_storage):
+    return all(storage.exists(name) for name in rendition_names(image_name))
+
+
+def generate_renditions(image_name, storage=default_storage):
+    """
+    Write every size x format rendition of `image_name` next to it, replacing
+    older ones. Returns the names written; an unreadable image is logged and
+    left with none (templates then fall back to the original).
+    """
+    try:
+        with storage.open(image_name, "rb") as original:
+            image = Image.open(original)
+            image = ImageOps.exif_transpose(image)  # Phone photos carry their rotation in EXIF
+            image = image.convert("RGB")
+    except (OSError, UnidentifiedImageError) as error:
+        logger.warning("Cannot read %s (%s), no renditions generated", image_name, error)
+        return []
+
+    written = []
+    for size, (width, height) in RENDITIONS.items():
+        # Crop to the rendition's aspect ratio, but never upscale a small original
+        scale = min(1, image.width / width, image.height / height)
+        dimensions = (max(1, round(width * scale)), max(1, round(height * scale)))
+        resized = ImageOps.fit(image, dimensions, Image.LANCZOS)
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **options)
+            name = rendition_name(image_name, size, extension)
+            storage.delete(name)  # Keep the predictable name instead of a storage-suffixed copy
+            written.append(storage.save(name, ContentFile(buffer.getvalue())))
+    return written
+
+
+def delete_renditions(image_name, storage=default_storage):
+    for name in rendition_names(image_name):
+        storage.delete(name)
@@ -0,0 +1,63 @@
+import re
+
+from django.db import connection
+from django.db.models import Case, ExpressionWrapper, F, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import FoodItem
+
+FULLTEXT_INDEX = 'fooditem_search_idx'  # MySQL only, created by migration 0013
+FULLTEXT_MIN_TOKEN = 3  # innodb_ft_min_token_size: shorter words are not in the index
+MAX_TERMS = 8
+
+
+def search_terms(query):
+    """Lowercased words of a search box query (at most MAX_TERMS)."""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+def fulltext_match(terms):
+    """MATCH ... AGAINST relevance requiring every term, each as a prefix (so "marg" finds "Margherita")."""
+    table = connection.ops.quote_name(FoodItem._meta.db_table)
+    against = ' '.join(f'+{term}*' for term in terms)
+    return RawSQL(
+        f'MATCH ({table}.name, {table}.description) AGAINST (%s IN BOOLEAN MODE)',
+        [against],
+        output_field=FloatField(),
+    )
+
+
+def search_menu(queryset, query):
+    """
+    Narrow a FoodItem queryset to dishes whose name or description contains every
+    word of `query`, best matches first (annotated as search_rank).
+
+    On MySQL the words go through the FULLTEXT index on (name, description). Other
+    databases, and words too short for the index, fall back to LIKE, ranked by
+    where the word was found: name prefix, then anywhere in the name, then description.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    use_fulltext = connection.vendor == 'mysql'
+    indexed = [term for term in terms if use_fulltext and len(term) >= FULLTEXT_MIN_TOKEN]
+
+    rank = Value(0.0)
+    for term in terms:
+        if term in indexed:
+            continue
+        queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        rank = rank + Case(
+            When(name__istartswith=term, then=Value(3.0)),
+            When(name__icontains=term, then=Value(2.0)),
+            default=Value(1.0),
+        )
+
+    if indexed:
+        queryset = queryset.annotate(search_match=fulltext_match(indexed)).filter(search_match__gt=0)
+        rank = rank + F('search_match')
+
+    return queryset.annotate(
+        search_rank=ExpressionWrapper(rank, output_field=FloatField())
+    ).order_by('-search_rank', 'name', 'id')
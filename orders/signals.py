@@ -0,0 +1,127 @@
+from collections import Counter
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cart import SessionCart, cart_backend, forget_cart_counts
+from .facets import adjust_facets, facet_cell, invalidate_facets
+from .menu_cache import bump_menu_version
+from .models import CartItem, Category, FoodItem, Order
+from .order_stream import publish_status
+from .renditions import delete_renditions
+from .storage import food_image_storage, is_hashed
+
+
+@receiver(post_save, sender=FoodItem)
+@receiver(post_delete, sender=FoodItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_menu_cache(sender, **kwargs):
+    """Any menu write (views, admin or imports) makes the cached menu stale."""
+    bump_menu_version()
+
+
+def release_food_image(name):
+    """
+    Drop a content-hashed image (and its renditions) once no dish uses it any more.
+    The reference count is the number of FoodItem rows naming the file, checked
+    after commit. A file still in its grace period may be about to be referenced
+    by an upload of the same bytes and is kept for manage.py hash_media --prune;
+    legacy names are left to manage.py hash_media.
+    """
+    if not is_hashed(name):
+        return
+
+    def release():
+        storage = food_image_storage()
+        if not FoodItem.objects.filter(image=name).exists() and not storage.in_grace_period(name):
+            storage.delete(name)
+            delete_renditions(name)
+
+    transaction.on_commit(release)
+
+
+@receiver(pre_save, sender=FoodItem)
+def remember_previous_row(sender, instance, raw=False, **kwargs):
+    """An edit may move a dish between facet cells or replace its image; note the old values."""
+    instance._previous_facet_cell = instance._previous_image = None
+    if instance.pk and not raw:
+        previous = FoodItem.objects.filter(pk=instance.pk).values_list(
+            'category_id', 'is_vegan', 'is_vegetarian', 'image'
+        ).first()
+        if previous is not None:
+            instance._previous_facet_cell, instance._previous_image = previous[:3], previous[3]
+
+
+@receiver(post_save, sender=FoodItem)
+def release_replaced_image(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if previous and previous != instance.image.name:
+        release_food_image(previous)
+
+
+@receiver(post_save, sender=FoodItem)
+def count_saved_food_item(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_facet_cell', None)
+    if raw or (not created and previous is None):
+        invalidate_facets()  # Where the dish was counted before is unknown
+        return
+    changes = Counter({facet_cell(instance): 1})
+    if previous is not None:
+        changes[previous] -= 1
+    adjust_facets(changes)
+
+
+@receiver(post_delete, sender=FoodItem)
+def count_deleted_food_item(sender, instance, **kwargs):
+    adjust_facets({facet_cell(instance): -1})
+
+
+@receiver(pre_delete, sender=FoodItem)
+def forget_counts_of_carts_holding(sender, instance, **kwargs):
+    """The delete cascades into CartItem rows; the carts that held the dish recount once it commits."""
+    user_ids = list(CartItem.objects.filter(food_item=instance).values_list('user_id', flat=True))
+    if user_ids:
+        transaction.on_commit(lambda: forget_cart_counts(user_ids))
+
+
+@receiver(post_delete, sender=FoodItem)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        release_food_image(instance.image.name)
+
+
+@receiver(post_delete, sender=Category)
+def drop_category_facets(sender, **kwargs):
+    invalidate_facets()
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_status(sender, instance, raw=False, **kwargs):
+    instance._previous_status = None
+    if instance.pk and not raw:
+        instance._previous_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def publish_order_status(sender, instance, created, raw=False, **kwargs):
+    """Feed the live order status stream (orders.order_stream) from every save that changes the status."""
+    if not raw and (created or instance.status != getattr(instance, '_previous_status', None)):
+        publish_status(instance)
+
+
+@receiver(user_logged_in)
+def adopt_session_cart(sender, request, user, **kwargs):
+    """Move what was added before signing in into the user's cart backend."""
+    if request is None:
+        return
+    backend = cart_backend()
+    session_cart = SessionCart(request, user)
+    if issubclass(backend, SessionCart) or not session_cart.items():
+        return
+    cart = backend(request, user)
+    for line in session_cart.lines():
+        cart.add(line.food_item.id, line.quantity)
+    session_cart.clear()
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)+$')  # Renditions (hash.card.webp) included
+HASHED_ORIGINAL = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+# Safe for hashed originals only: their content can never change under the same URL. Renditions
+# keep the original's name but are rewritten by generate_renditions --force or new RENDITIONS.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# An upload reusing a stored file commits its row after _save; until then no FoodItem names
+# the file, so releases leave files written or reused this recently alone
+RELEASE_GRACE_PERIOD = 60 * 10
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.search(name or ''))
+
+
+def is_hashed_original(name):
+    return bool(HASHED_ORIGINAL.search(name or ''))
+
+
+def reuse_key(name):
+    return f"media:reused:{hashlib.sha1(name.encode()).hexdigest()}"
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentHashStorage(FileSystemStorage):
+    """
+    Stores each file under the SHA-256 of its content, keeping the upload_to
+    directory and the extension: food_item_pics/3f/3f9c...e1.jpg.
+
+    Uploading bytes that are already stored writes nothing and returns the
+    existing name, so identical images are kept once and can be shared by
+    several dishes. Deleting is left to the callers that know whether a file is
+    still referenced (see orders.signals.release_food_image), and they skip
+    files written or reused within RELEASE_GRACE_PERIOD: the reuse is noted in
+    the cache (the file itself is left untouched, its mtime feeds
+    Last-Modified) and covers an upload whose row is not committed yet.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name  # Never suffix: the name is replaced by the content hash in _save
+
+    def hashed_name(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        digest = content_hash(content)
+        return os.path.join(directory, digest[:2], f"{digest}{extension}").replace(os.sep, '/')
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            cache.set(reuse_key(name), True, RELEASE_GRACE_PERIOD)
+            return name
+
+        # Write to a temporary file and rename it into place: two uploads of the same
+        # bytes racing here both succeed, and a reader never sees a half-written file
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, mode=self.directory_permissions_mode or 0o777, exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as temporary:
+                for chunk in content.chunks():
+                    temporary.write(chunk)
+            os.chmod(temporary_path, self.file_permissions_mode or 0o644)
+            os.replace(temporary_path, full_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return name
+
+    def in_grace_period(self, name):
+        """Whether `name` was written or reused too recently to be deleted safely."""
+        if cache.get(reuse_key(name)):
+            return True
+        try:
+            return time.time() - os.path.getmtime(self.path(name)) < RELEASE_GRACE_PERIOD
+        except FileNotFoundError:
+            return False
+
+    def cache_control(self, name):
+        return IMMUTABLE_CACHE_CONTROL if is_hashed_original(name) else None
+
+
+def food_image_storage():
+    return ContentHashStorage()
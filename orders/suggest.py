@@ -0,0 +1,86 @@
+import threading
+import time
+from bisect import bisect_left
+
+from .menu_cache import get_menu_version
+from .models import Category, FoodItem
+
+MAX_ENTRIES = 50000  # Keys held per worker; past that the alphabetically last keys are dropped
+MAX_SCAN = 200  # Keys looked at per lookup, so a one-letter prefix stays as cheap as a long one
+SUGGEST_LIMIT = 8
+VERSION_CHECK_INTERVAL = 1.0  # Seconds between menu version checks (a cache read, never a query)
+
+_lock = threading.Lock()
+_index = None
+_version = None
+_checked_at = 0.0
+
+
+class SuggestIndex:
+    """
+    Sorted array of lowercased name keys, searched with bisect. Every name is
+    indexed from each of its words, so "marg" finds "Pizza Margherita"; a match
+    on the start of the whole name ranks before a match on a later word.
+    """
+
+    def __init__(self, names):
+        keys = []
+        for kind, name in names:
+            words = name.lower().split()
+            for position in range(len(words)):
+                keys.append((" ".join(words[position:]), position > 0, kind, name))
+        keys.sort()
+        self.keys = keys[:MAX_ENTRIES]
+        self.folded = [key[0] for key in self.keys]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def suggest(self, prefix, limit=SUGGEST_LIMIT):
+        """[{"label", "type"}] of names with a word starting with `prefix`."""
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        start = bisect_left(self.folded, prefix)
+        matches = []
+        for folded, inner, kind, name in self.keys[start:start + MAX_SCAN]:
+            if not folded.startswith(prefix):
+                break
+            matches.append((inner, kind != "category", name.lower(), kind, name))
+
+        suggestions, seen = [], set()
+        for _, _, _, kind, name in sorted(matches):
+            if (kind, name) not in seen:
+                seen.add((kind, name))
+                suggestions.append({"label": name, "type": kind})
+                if len(suggestions) == limit:
+                    break
+        return suggestions
+
+
+def build_index():
+    names = [("category", name) for name in Category.objects.values_list("name", flat=True)]
+    names += [("item", name) for name in FoodItem.objects.values_list("name", flat=True).distinct()]
+    return SuggestIndex(names)
+
+
+def get_suggest_index():
+    """
+    This worker's index. It is built on first use and rebuilt once the menu
+    version moves (see orders.menu_cache.bump_menu_version).
+    """
+    global _index, _version, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return _index
+
+    version = get_menu_version()
+    with _lock:
+        if _index is None or version != _version:
+            _index, _version = build_index(), version
+        _checked_at = now
+    return _index
+
+
+def suggest(prefix, limit=SUGGEST_LIMIT):
+    return get_suggest_index().suggest(prefix, limit)
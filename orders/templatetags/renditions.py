@@ -0,0 +1,34 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from orders.renditions import RENDITIONS, rendition_name
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(image, size, alt="", css_class="", style=""):
+    """
+    <picture> for a FoodItem image: the WebP rendition of `size` with a JPEG
+    fallback, or the original when renditions have not been generated yet.
+    """
+    if not image:
+        return ""
+    width, height = RENDITIONS[size]
+    # The JPEG of a size is written after its WebP, so it stands for both
+    if not default_storage.exists(rendition_name(image.name, size, "jpg")):
+        return format_html('<img src="{}" alt="{}" class="{}" style="{}" loading="lazy">', image.url, alt, css_class, style)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}">'
+        '<img src="{}" alt="{}" class="{}" style="{}" width="{}" height="{}" loading="lazy"></picture>',
+        default_storage.url(rendition_name(image.name, size, "webp")),
+        default_storage.url(rendition_name(image.name, size, "jpg")),
+        alt, css_class, style, width, height,
+    )
+
+
+@register.simple_tag
+def rendition_url(image, size, extension="webp"):
+    """URL of one rendition, e.g. {% rendition_url item.image "thumb" "jpg" %}."""
+    return default_storage.url(rendition_name(image.name, size, extension))
@@ -1,3 +1,1532 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.contrib.auth.models import User
+from openpyxl import Workbook, load_workbook
+from PIL import Image
+from django.db import connection
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils.timezone import now
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import analytics, facets, filters, kitchen, order_stream, suggest, views
+from .cancellation import cancel_deadline, cancel_order
+from .lifecycle import StaleOrderError, TransitionError, record_event, transition
+from .cart import DatabaseCart
+from .history import build_history_feed
+from .import_jobs import claim_next_job, enqueue_import, run_job
+from .menu_cache import get_menu_version, menu_cache_stats
+from .menu_import import EXPECTED_COLUMNS, MenuImporter, MenuImportError
+from .models import CartItem, Category, FoodItem, ItemSalesRollup, MenuImportJob, Order, OrderEvent, OrderHistory, SalesRollup
+from .query_audit import full_scans
+from .renditions import generate_renditions, has_renditions, rendition_names
+from .search import search_menu
+from .storage import IMMUTABLE_CACHE_CONTROL, RELEASE_GRACE_PERIOD, food_image_storage, is_hashed, reuse_key
+
+
+# In-memory caches for every test class: the project's file caches (cache/) would
+# leak entries such as cart counters between tests and between runs
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'orders-tests'},
+    'menu': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'orders-tests-menu'},
+}
+
+
+def use_test_caches(cls):
+    """Run `cls` on TEST_CACHES, emptied before each test."""
+    setup = cls.setUp
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        setup(self)
+
+    cls.setUp = setUp
+    return override_settings(CACHES=TEST_CACHES)(cls)
+
+
+class OrderFixtures:
+    """The people the order tests need: a customer (`user`), another customer (`other`) and a staff member."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="customer", password="secret")
+        cls.other = User.objects.create_user(username="other", password="secret")
+        cls.staff = User.objects.create_user(username="staff", password="secret", is_staff=True)
+
+
+def place_order(user, items=(), status='Pending', **fields):
+    """
+    An order of `items` ((FoodItem, quantity) pairs) with the OrderHistory
+    snapshot checkout writes. total_amount defaults to the lines' total (10
+    without items) and cancellable_until to a fresh window; `created_at`
+    backdates the order.
+    """
+    created_at = fields.pop('created_at', None)
+    fields.setdefault('total_amount', sum(item.price * quantity for item, quantity in items) or 10)
+    fields.setdefault('cancellable_until', cancel_deadline())
+    order = Order.objects.create(user=user, status=status, **fields)
+    OrderHistory.objects.bulk_create([
+        OrderHistory(
+            order=order, item=item, quantity=quantity,
+            item_name=item.name, category_name=item.category.name, unit_price=item.price,
+        )
+        for item, quantity in items
+    ])
+    if created_at is not None:
+        Order.objects.filter(id=order.id).update(created_at=created_at)  # auto_now_add ignores it on create
+        order.created_at = created_at
+    return order
+
+
+@use_test_caches
+class OrderHistoryFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="customer", password="secret")
+        category = Category.objects.create(name="Burgers")
+        cls.items = [
+            FoodItem.objects.create(name=f"Burger {i}", price=5 + i, description="Tasty", category=category)
+            for i in range(3)
+        ]
+
+    def place_orders(self, count, status):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, total_amount=10, status=status)
+            for item in self.items:
+                OrderHistory.from_menu(order, item, 2).save()
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.place_orders(3, 'Completed')
+        self.place_orders(2, 'Cancelled')
+
+        # statuses + one page per status + all lines, the lines without touching the menu
+        with CaptureQueriesContext(connection) as context:
+            small = build_history_feed(self.user)
+            [line.item_name for group in small for order in group['orders'] for line in order.lines]
+        self.assertEqual(len(context), 4)
+        self.assertFalse([query for query in context if 'orders_fooditem' in query['sql']])
+
+        self.place_orders(40, 'Completed')
+        self.place_orders(40, 'Cancelled')
+
+        with self.assertNumQueries(4):
+            large = build_history_feed(self.user)
+            [line.item_name for group in large for order in group['orders'] for line in order.lines]
+
+    def test_groups_follow_status_choices_and_skip_empty(self):
+        self.place_orders(1, 'Cancelled')
+        self.place_orders(1, 'Completed')
+
+        statuses = [group['status'] for group in build_history_feed(self.user)]
+        self.assertEqual(statuses, ['Completed', 'Cancelled'])
+
+    def test_keyset_pagination_walks_every_order_once(self):
+        self.place_orders(7, 'Completed')
+        # Orders created in the same instant must still page deterministically by id
+        Order.objects.filter(user=self.user).update(created_at=Order.objects.first().created_at)
+
+        seen, cursor = [], None
+        while True:
+            group = build_history_feed(self.user, {'Completed': cursor}, page_size=3)[0]
+            seen.extend(order.id for order in group['orders'])
+            cursor = group['next_cursor']
+            if not cursor:
+                break
+
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_newest_orders_come_first(self):
+        self.place_orders(2, 'Completed')
+        older = Order.objects.order_by('id').first()
+        older.created_at -= timedelta(days=1)
+        older.save(update_fields=['created_at'])
+
+        orders = build_history_feed(self.user)[0]['orders']
+        self.assertEqual(orders[-1].id, older.id)
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        self.place_orders(2, 'Completed')
+
+        orders = build_history_feed(self.user, {'Completed': 'not-a-cursor'})[0]['orders']
+        self.assertEqual(len(orders), 2)
+
+    def test_view_renders_lines(self):
+        self.place_orders(1, 'Completed')
+        self.client.login(username="customer", password="secret")
+
+        response = self.client.get(reverse('orders:order_history'))
+        self.assertContains(response, "Burger 2")
+        self.assertEqual(response.context['active_status'], 'Completed')
+
+
+@use_test_caches
+class PlaceOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="customer", password="secret")
+        category = Category.objects.create(name="Pasta")
+        cls.items = [
+            FoodItem.objects.create(name=f"Pasta {i}", price=4 + i, description="Fresh", category=category)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client.login(username="customer", password="secret")
+
+    def fill_cart(self, count):
+        for item in self.items[:count]:
+            CartItem.objects.create(user=self.user, food_item=item, quantity=2)
+
+    def test_order_gets_every_line_and_cart_is_emptied(self):
+        self.fill_cart(3)
+
+        response = self.client.get(reverse('orders:place_order'))
+
+        order = Order.objects.get(user=self.user)
+        self.assertRedirects(response, f"{reverse('orders:payment_success')}?order={order.id}")
+        self.assertEqual(order.status, 'Pending')
+        self.assertIsNotNone(order.cancellable_until)
+        self.assertEqual(order.total_amount, 2 * (4 + 5 + 6))
+        self.assertEqual(order.orderhistory_set.count(), 3)
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+    def test_lines_keep_checkout_price_and_name(self):
+        self.fill_cart(2)
+        self.client.get(reverse('orders:place_order'))
+
+        FoodItem.objects.filter(id=self.items[0].id).update(name="Renamed", price=99)
+        self.items[1].delete()
+
+        order = Order.objects.get(user=self.user)
+        lines = list(order.orderhistory_set.order_by('id').values_list('item_name', 'category_name', 'unit_price', 'item_id'))
+        self.assertEqual(lines, [("Pasta 0", "Pasta", Decimal("4.00"), self.items[0].id), ("Pasta 1", "Pasta", Decimal("5.00"), None)])
+        self.assertEqual(sum(line.total_price() for line in order.orderhistory_set.all()), order.total_amount)
+
+    def test_migration_backfills_existing_lines(self):
+        order = Order.objects.create(user=self.user, total_amount=8, status='Completed')
+        line = OrderHistory.objects.create(order=order, item=self.items[0], quantity=2, unit_price=0)
+
+        migration = importlib.import_module('orders.migrations.0011_orderhistory_price_snapshot')
+        migration.snapshot_order_lines(django_apps, None)
+
+        line.refresh_from_db()
+        self.assertEqual((line.item_name, line.category_name, line.unit_price), ("Pasta 0", "Pasta", Decimal("4.00")))
+
+    def test_checkout_cost_is_flat_in_cart_size(self):
+        def checkout_queries(count):
+            self.fill_cart(count)
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(reverse('orders:place_order'))
+            return len(context)
+
+        self.assertEqual(checkout_queries(1), checkout_queries(5))
+
+    def test_failure_while_writing_lines_leaves_no_order(self):
+        self.fill_cart(3)
+
+        with mock.patch.object(OrderHistory.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.get(reverse('orders:place_order'))
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 3)
+
+
+@use_test_caches
+class MenuCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="customer", password="secret")
+        cls.category = Category.objects.create(name="Salads")
+        for i in range(8):
+            FoodItem.objects.create(name=f"Salad {i}", price=3, description="Green", category=cls.category)
+
+    def setUp(self):
+        self.client.login(username="customer", password="secret")
+
+    def menu_queries(self, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('orders:cat_menu'), params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context if 'orders_fooditem' in query['sql']]
+
+    def test_repeat_page_is_served_from_cache(self):
+        self.assertTrue(self.menu_queries({'name': 'salad', 'page': 2}))
+        # Same filters in a different shape hit the same entry
+        self.assertFalse(self.menu_queries({'page': '2', 'name': ' SALAD ', 'vegan': ''}))
+
+        stats = menu_cache_stats()
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
+
+    def test_menu_write_bumps_version_and_invalidates(self):
+        self.menu_queries({'name': 'salad'})
+        version = get_menu_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FoodItem.objects.create(name="Salad new", price=3, description="Green", category=self.category)
+
+        self.assertNotEqual(get_menu_version(), version)
+        self.assertTrue(self.menu_queries({'name': 'salad'}))
+
+    def test_cache_miss_is_a_single_select_without_count(self):
+        queries = self.menu_queries({'name': 'salad', 'page': 2})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0])
+
+    def test_has_next_comes_from_the_extra_row(self):
+        first = self.client.get(reverse('orders:cat_menu')).context['page_obj']
+        self.assertEqual(len(first), 6)
+        self.assertTrue(first.has_next())
+
+        last = self.client.get(reverse('orders:cat_menu'), {'page': 2}).context['page_obj']
+        self.assertEqual(len(last), 2)
+        self.assertFalse(last.has_next())
+        self.assertTrue(last.has_previous())
+
+
+@use_test_caches
+class FilterImportWithoutDatabaseTests(SimpleTestCase):
+    # SimpleTestCase refuses every query, which stands in for MySQL being down
+    def test_module_imports_and_filter_builds_without_queries(self):
+        module = importlib.reload(filters)
+        module.FoodItemFilter({'name': 'pizza'}, queryset=FoodItem.objects.none())
+
+
+@use_test_caches
+class CategoryChoicesTests(TestCase):
+    def choices(self):
+        return [value for value, _ in filters.FoodItemFilter({}).form.fields['category'].choices if value]
+
+    def test_choices_are_cached_and_refreshed_on_category_change(self):
+        Category.objects.create(name="Desserts")
+        self.assertEqual(self.choices(), ["Desserts"])
+
+        with self.assertNumQueries(0):
+            self.choices()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Burgers")
+        self.assertEqual(self.choices(), ["Burgers", "Desserts"])
+
+
+@use_test_caches
+class MenuImporterTests(TestCase):
+    def xlsx(self, rows, header=EXPECTED_COLUMNS):
+        wb = Workbook()
+        wb.active.append(header)
+        for row in rows:
+            wb.active.append(row)
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+        return buffer
+
+    def csv(self, text):
+        return io.BytesIO(text.encode())
+
+    def test_valid_rows_are_inserted_and_failures_reported(self):
+        Category.objects.create(name="Pizza")
+        rows = [
+            ["Margherita", "Pizza", 9.5, "Cheese", True, False, None],
+            ["Margherita", "Pizza", 9.5, "Same again", True, False, None],
+            [None, "Pizza", 4, "No name", False, False, None],
+            ["Falafel", "Wraps", "cheap", "Bad price", True, True, None],
+            ["Hummus", "Wraps", 5, "Dip", True, True, None],
+        ]
+
+        result = MenuImporter(chunk_size=2).run(self.xlsx(rows), "menu.xlsx")
+
+        self.assertEqual(result.rows_processed, 5)
+        self.assertEqual(result.inserted, 2)
+        self.assertEqual(sorted(FoodItem.objects.values_list("name", flat=True)), ["Hummus", "Margherita"])
+        self.assertEqual(
+            [(error["row"], sorted(error["errors"])) for error in result.error_rows],
+            [(3, ["Name"]), (4, ["Name"]), (5, ["Price"])],
+        )
+
+    def test_existing_items_are_duplicates(self):
+        category = Category.objects.create(name="Pizza")
+        FoodItem.objects.create(name="Margherita", price=9, description="Cheese", category=category, is_vegetarian=True)
+
+        result = MenuImporter().run(self.xlsx([["Margherita", "Pizza", 9, "Cheese", True, False, None]]), "menu.xlsx")
+        self.assertEqual(result.inserted, 0)
+        self.assertEqual(result.error_rows[0]["errors"], {"Name": "Duplicate entry: Margherita in Pizza"})
+
+    def test_csv_upload(self):
+        data = ",".join(EXPECTED_COLUMNS) + "\nTea,Drinks,2.50,Hot,TRUE,TRUE,\nCoffee,Drinks,3,Hot,yes,TRUE,\n"
+
+        result = MenuImporter().run(self.csv(data), "menu.csv")
+        self.assertEqual(result.inserted, 1)
+        self.assertEqual(FoodItem.objects.get().price, Decimal("2.50"))
+        self.assertEqual(result.error_rows[0]["errors"], {"Is_Vegetarian": "Is_Vegetarian must be bool"})
+
+    def test_queries_per_chunk_do_not_depend_on_rows(self):
+        def import_queries(count, offset):
+            rows = [[f"Dish {offset + i}", "Mains", 10, "Food", False, False, None] for i in range(count)]
+            with CaptureQueriesContext(connection) as context:
+                MenuImporter(chunk_size=count).run(self.xlsx(rows), "menu.xlsx")
+            return len(context)
+
+        import_queries(1, 0)  # Creates the category
+        self.assertEqual(import_queries(3, 100), import_queries(100, 200))
+
+    def test_wrong_columns(self):
+        with self.assertRaises(MenuImportError) as context:
+            MenuImporter().run(self.xlsx([], header=["Name", "Colour"]), "menu.xlsx")
+        self.assertIn("Price", context.exception.missing_columns)
+        self.assertEqual(context.exception.extra_columns, ["Colour"])
+
+    def test_empty_file(self):
+        with self.assertRaisesMessage(MenuImportError, "The uploaded file is empty."):
+            MenuImporter().run(self.xlsx([]), "menu.xlsx")
+
+
+@use_test_caches
+class MenuImportJobTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username="staff", password="secret", is_staff=True)
+        self.client.login(username="staff", password="secret")
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, rows):
+        wb = Workbook()
+        wb.active.append(EXPECTED_COLUMNS)
+        for row in rows:
+            wb.active.append(row)
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return SimpleUploadedFile("menu.xlsx", buffer.getvalue())
+
+    def test_upload_only_queues_the_job(self):
+        response = self.client.post(reverse('orders:import_menu'), {'file': self.upload([["Tea", "Drinks", 2, "Hot", True, True, None]])})
+
+        job = MenuImportJob.objects.get()
+        self.assertRedirects(response, f"{reverse('orders:import_menu')}?job={job.id}")
+        self.assertEqual(job.status, 'Queued')
+        self.assertFalse(FoodItem.objects.exists())
+
+    def test_worker_runs_job_and_endpoint_reports_progress(self):
+        job = enqueue_import(self.upload([
+            ["Tea", "Drinks", 2, "Hot", True, True, None],
+            ["Coffee", "Drinks", "free", "Hot", True, True, None],
+        ]), self.staff)
+
+        call_command("menu_import_worker", "--once", stdout=io.StringIO())
+
+        status = self.client.get(reverse('orders:import_job_status', args=[job.id])).json()
+        self.assertEqual(status['status'], 'Completed')
+        self.assertTrue(status['finished'])
+        self.assertEqual((status['rows_processed'], status['rows_inserted'], status['error_count']), (2, 1, 1))
+        self.assertEqual(status['error_file'], reverse('orders:import_job_errors', args=[job.id]))
+
+        response = self.client.get(status['error_file'])
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        report = load_workbook(io.BytesIO(b"".join(response.streaming_content))).active
+        rows = list(report.iter_rows(values_only=True))
+        self.assertEqual(rows, [("Row",) + tuple(EXPECTED_COLUMNS), (3, "Coffee", "Drinks", "free", "Hot", True, True, None)])
+        self.assertEqual(report["D2"].comment.text, "Price must be int or float")
+        self.assertIsNone(report["B2"].comment)
+
+    def test_import_files_are_staff_only(self):
+        job = enqueue_import(self.upload([["Coffee", "Drinks", "free", "Hot", True, True, None]]), self.staff)
+        call_command("menu_import_worker", "--once", stdout=io.StringIO())
+        job.refresh_from_db()
+        upload_url = reverse('orders:import_job_upload', args=[job.id])
+        errors_url = reverse('orders:import_job_errors', args=[job.id])
+
+        response = self.client.get(upload_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="menu.xlsx"', response["Content-Disposition"])
+        self.assertEqual(self.client.get(errors_url).status_code, 200)
+
+        self.client.logout()
+        for url in (upload_url, errors_url, f"/media/{job.file.name}", f"/media/{job.error_file}"):
+            self.assertNotEqual(self.client.get(url).status_code, 200, url)
+        self.assertEqual(self.client.get(f"/media/{job.error_file}").status_code, 404)
+
+    def test_each_import_gets_its_own_report(self):
+        rows = [["", "Drinks", 2, "Hot", True, True, None]]
+        enqueue_import(self.upload(rows), self.staff)
+        enqueue_import(self.upload(rows), self.staff)
+
+        first, second = run_job(claim_next_job()), run_job(claim_next_job())
+
+        self.assertTrue(first.error_file)
+        self.assertNotEqual(first.error_file, second.error_file)
+
+    def test_claimed_job_is_not_handed_out_twice(self):
+        enqueue_import(self.upload([]), self.staff)
+
+        self.assertIsNotNone(claim_next_job())
+        self.assertIsNone(claim_next_job())
+
+    def test_starting_worker_fails_jobs_abandoned_by_a_dead_one(self):
+        stale = enqueue_import(self.upload([]), self.staff)
+        claim_next_job()
+        MenuImportJob.objects.filter(id=stale.id).update(started_at=now() - timedelta(hours=2))
+        running = enqueue_import(self.upload([]), self.staff)
+        claim_next_job()
+
+        call_command("menu_import_worker", "--once", stdout=io.StringIO())
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'Failed')
+        self.assertIsNotNone(stale.finished_at)
+        self.assertTrue(self.client.get(reverse('orders:import_job_status', args=[stale.id])).json()['finished'])
+        self.assertEqual(MenuImportJob.objects.get(id=running.id).status, 'Running')
+
+    def test_bad_columns_fail_the_job(self):
+        wb = Workbook()
+        wb.active.append(["Name", "Colour"])
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        job = enqueue_import(SimpleUploadedFile("menu.xlsx", buffer.getvalue()), self.staff)
+
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, 'Failed')
+        self.assertIn("Unexpected columns found: Colour", job.error_message)
+
+
+@use_test_caches
+class AddToCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="customer", password="secret")
+        category = Category.objects.create(name="Drinks")
+        cls.tea = FoodItem.objects.create(name="Tea", price=2, description="Hot", category=category)
+        cls.coffee = FoodItem.objects.create(name="Coffee", price=3, description="Hot", category=category)
+
+    def setUp(self):
+        self.client.login(username="customer", password="secret")
+
+    def add(self, item, quantity=1):
+        return self.client.post(reverse('orders:add_to_cart', args=[item.id]), {'quantity': quantity})
+
+    def test_repeated_adds_increment_one_line(self):
+        self.assertEqual(self.add(self.tea, 2).json()['cart_count'], 1)
+        self.assertEqual(self.add(self.tea, 3).json()['cart_count'], 1)
+        self.assertEqual(self.add(self.coffee).json()['cart_count'], 2)
+
+        self.assertEqual(CartItem.objects.get(food_item=self.tea).quantity, 5)
+
+    def test_add_is_a_single_write_once_the_count_is_cached(self):
+        self.add(self.tea)
+
+        with CaptureQueriesContext(connection) as context:
+            self.add(self.tea)
+        cart_queries = [query['sql'] for query in context if 'orders_cartitem' in query['sql']]
+        self.assertEqual(len(cart_queries), 1)
+        self.assertTrue(cart_queries[0].startswith('INSERT'))
+
+    def test_new_line_is_counted_in_the_same_round_trip(self):
+        self.add(self.tea)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.add(self.coffee).json()['cart_count'], 2)
+        self.assertEqual(len([query for query in context if 'orders_cartitem' in query['sql']]), 1)
+
+    def test_menu_delete_drops_the_cached_count(self):
+        self.add(self.tea)
+        self.add(self.coffee)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FoodItem.objects.get(id=self.coffee.id).delete()
+
+        self.assertEqual(self.add(self.tea).json()['cart_count'], 1)
+
+    def test_count_follows_removals(self):
+        self.add(self.tea)
+        self.add(self.coffee)
+        self.client.get(reverse('orders:remove_from_cart', args=[self.tea.id]))
+        self.assertEqual(self.add(self.coffee).json()['cart_count'], 1)
+
+    def test_rejects_bad_quantity(self):
+        self.assertEqual(self.add(self.tea, 0).status_code, 400)
+        self.assertEqual(self.add(self.tea, "lots").status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+
+
+@use_test_caches
+class SessionCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="customer", password="secret")
+        category = Category.objects.create(name="Drinks")
+        cls.tea = FoodItem.objects.create(name="Tea", price=2, description="Hot", category=category)
+        cls.coffee = FoodItem.objects.create(name="Coffee", price=3, description="Hot", category=category)
+
+    def add(self, item, quantity=1):
+        return self.client.post(reverse('orders:add_to_cart', args=[item.id]), {'quantity': quantity}).json()
+
+    def test_anonymous_cart_never_touches_cart_table(self):
+        with CaptureQueriesContext(connection) as context:
+            self.add(self.tea, 2)
+            self.assertEqual(self.add(self.tea)['cart_count'], 1)
+            self.assertEqual(self.add(self.coffee)['cart_count'], 2)
+        self.assertFalse([query for query in context if 'orders_cartitem' in query['sql']])
+
+        response = self.client.get(reverse('orders:cart'))
+        self.assertEqual(response.context['total_amount'], 3 * 2 + 3)
+
+    def test_cart_moves_into_database_cart_on_login(self):
+        self.add(self.tea, 2)
+        self.client.login(username="customer", password="secret")
+
+        self.assertEqual(dict(CartItem.objects.values_list('food_item_id', 'quantity')), {self.tea.id: 2})
+        self.assertEqual(self.client.session.get('cart'), {})
+
+    @override_settings(CART_BACKEND='orders.cart.SessionCart')
+    def test_session_backend_is_materialized_at_checkout(self):
+        self.client.login(username="customer", password="secret")
+        self.add(self.tea, 2)
+        self.add(self.coffee)
+        self.assertFalse(CartItem.objects.exists())
+
+        self.client.get(reverse('orders:place_order'))
+
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, 7)
+        self.assertEqual(sorted(order.orderhistory_set.values_list('quantity', flat=True)), [1, 2])
+        self.assertEqual(self.client.session.get('cart'), {})
+
+
+@use_test_caches
+class CartApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="customer", password="secret")
+        category = Category.objects.create(name="Drinks")
+        cls.tea = FoodItem.objects.create(name="Tea", price="2.50", description="Hot", category=category)
+        cls.coffee = FoodItem.objects.create(name="Coffee", price=3, description="Hot", category=category)
+
+    def setUp(self):
+        self.client.login(username="customer", password="secret")
+        CartItem.objects.create(user=self.user, food_item=self.tea, quantity=2)
+        CartItem.objects.create(user=self.user, food_item=self.coffee, quantity=1)
+
+    def item_url(self, item):
+        return reverse('orders:cart_api_item', args=[item.id])
+
+    def test_summary_is_one_query(self):
+        with self.assertNumQueries(1):
+            summary = DatabaseCart(RequestFactory().get('/'), self.user).summary()
+
+        self.assertEqual(summary['cart_count'], 2)
+        self.assertEqual(summary['total_amount'], Decimal("8.00"))
+        self.assertEqual([line['line_total'] for line in summary['lines']], [Decimal("5.00"), Decimal("3.00")])
+
+    def test_set_quantity_returns_new_totals(self):
+        summary = self.client.post(self.item_url(self.tea), {'quantity': 4}).json()
+
+        self.assertEqual(Decimal(summary['total_amount']), Decimal("13.00"))
+        self.assertEqual(Decimal(summary['lines'][0]['line_total']), Decimal("10.00"))
+        self.assertEqual(CartItem.objects.get(food_item=self.tea).quantity, 4)
+
+    def test_delete_removes_line(self):
+        summary = self.client.delete(self.item_url(self.coffee)).json()
+
+        self.assertEqual(summary['cart_count'], 1)
+        self.assertEqual(Decimal(summary['total_amount']), Decimal("5.00"))
+        self.assertEqual(self.client.get(reverse('orders:cart_api')).json(), summary)
+
+    def test_rejects_bad_quantity_and_unknown_line(self):
+        self.assertEqual(self.client.post(self.item_url(self.tea), {'quantity': 0}).status_code, 400)
+        CartItem.objects.filter(food_item=self.coffee).delete()
+        self.assertEqual(self.client.post(self.item_url(self.coffee), {'quantity': 1}).status_code, 404)
+        self.assertFalse(CartItem.objects.filter(food_item=self.coffee).exists())
+
+
+@use_test_caches
+class QueryPlanAuditTests(TestCase):
+    def test_hot_queries_stay_on_indexes(self):
+        call_command('audit_query_plans', stdout=io.StringIO())
+
+    def test_unindexed_filter_is_reported(self):
+        self.assertEqual(full_scans(FoodItem.objects.filter(description='Hot')), ['orders_fooditem'])
+        self.assertEqual(full_scans(Order.objects.filter(user_id=1)), [])
+
+
+@use_test_caches
+class MenuSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Pizza")
+        FoodItem.objects.create(name="Margherita", price=8, description="Tomato, mozzarella and basil", category=category)
+        FoodItem.objects.create(name="Basil Pesto Pasta", price=9, description="Fresh pasta", category=category)
+        FoodItem.objects.create(name="Garlic Bread", price=4, description="With basil butter", category=category)
+        FoodItem.objects.create(name="Sweet Basil Soda", price=3, description="Fizzy", category=category)
+
+    def search(self, query):
+        return [item.name for item in search_menu(FoodItem.objects.all(), query)]
+
+    def test_matches_description_and_ranks_name_prefix_first(self):
+        self.assertEqual(self.search("basil"), ["Basil Pesto Pasta", "Sweet Basil Soda", "Garlic Bread", "Margherita"])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search("basil BUTTER!"), ["Garlic Bread"])
+        self.assertEqual(self.search("basil sushi"), [])
+
+    def test_blank_query_leaves_queryset_alone(self):
+        self.assertEqual(len(self.search("  ")), 4)
+
+    def test_menu_filter_uses_search(self):
+        response = self.client.get(reverse('orders:cat_menu'), {'name': 'mozzarella'})
+        self.assertEqual([item.name for item in response.context['food_items']], ["Margherita"])
+
+
+@use_test_caches
+class MenuSuggestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pizza = Category.objects.create(name="Pizza")
+        FoodItem.objects.create(name="Pizza Margherita", price=8, description="Classic", category=cls.pizza)
+        FoodItem.objects.create(name="Margarita Mocktail", price=4, description="Lime", category=cls.pizza)
+        FoodItem.objects.create(name="Pepperoni", price=9, description="Spicy", category=cls.pizza)
+
+    def setUp(self):
+        patcher = mock.patch.multiple(suggest, _index=None, _version=None, VERSION_CHECK_INTERVAL=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def labels(self, query):
+        response = self.client.get(reverse('orders:menu_suggest'), {'q': query})
+        return [suggestion['label'] for suggestion in response.json()['suggestions']]
+
+    def test_name_starts_rank_before_later_words(self):
+        self.assertEqual(self.labels("MAR"), ["Margarita Mocktail", "Pizza Margherita"])
+        self.assertEqual(self.labels("p"), ["Pizza", "Pepperoni", "Pizza Margherita"])
+        self.assertEqual(self.labels(""), [])
+
+    def test_answers_without_queries_once_built(self):
+        self.labels("pep")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels("pepp"), ["Pepperoni"])
+
+    def test_index_is_rebuilt_after_menu_change(self):
+        self.assertEqual(self.labels("fung"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            FoodItem.objects.create(name="Funghi", price=8, description="Mushroom", category=self.pizza)
+        self.assertEqual(self.labels("fung"), ["Funghi"])
+
+    def test_index_size_is_bounded(self):
+        with mock.patch.object(suggest, 'MAX_ENTRIES', 2):
+            self.assertEqual(len(suggest.SuggestIndex([("item", "a b c"), ("item", "d")])), 2)
+
+
+@use_test_caches
+class FacetCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pizza = Category.objects.create(name="Pizza")
+        cls.salads = Category.objects.create(name="Salads")
+        for name, category, is_vegan, is_vegetarian in [
+            ("Margherita", cls.pizza, False, True),
+            ("Pepperoni", cls.pizza, False, False),
+            ("Marinara", cls.pizza, True, True),
+            ("Green Salad", cls.salads, True, True),
+            ("Caesar", cls.salads, False, False),
+        ]:
+            FoodItem.objects.create(name=name, price=5, description="Good", category=category, is_vegan=is_vegan, is_vegetarian=is_vegetarian)
+
+    def test_matrix_is_one_group_by(self):
+        with self.assertNumQueries(1):
+            matrix = facets.build_matrix()
+        self.assertEqual(matrix[(self.pizza.id, False, True)], 1)
+        self.assertEqual(sum(matrix.values()), 5)
+
+    def test_counts_apply_the_other_filters(self):
+        counts = facets.facet_counts(category="Pizza", vegetarian=True)
+
+        self.assertEqual(counts['category'], {"Pizza": 2, "Salads": 1})
+        self.assertEqual(counts['vegan'], {True: 1, False: 1})
+        self.assertEqual(counts['vegetarian'], {True: 2, False: 1})
+
+        # Both the matrix and the category ids are cached now
+        with self.assertNumQueries(0):
+            self.assertEqual(facets.facet_counts(vegan=True)['category'], {"Pizza": 1, "Salads": 1})
+
+    def test_writes_adjust_the_cached_matrix(self):
+        facets.facet_matrix()
+        with self.captureOnCommitCallbacks(execute=True):
+            FoodItem.objects.create(name="Quattro", price=9, description="Cheese", category=self.pizza, is_vegetarian=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            caesar = FoodItem.objects.get(name="Caesar")
+            caesar.category = self.pizza
+            caesar.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            FoodItem.objects.get(name="Green Salad").delete()
+
+        self.assertEqual(caches['menu'].get(facets.FACETS_KEY), facets.build_matrix())
+
+    def test_menu_page_labels_choices_with_counts(self):
+        response = self.client.get(reverse('orders:cat_menu'), {'vegan': 'true'})
+        form = response.context['filter'].form
+
+        self.assertIn(("Salads", "Salads (1)"), form.fields['category'].choices)
+        self.assertIn(("true", "Yes (2)"), form.fields['vegan'].widget.choices)
+
+
+def jpeg_bytes(size=(1200, 900), color="orange"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@use_test_caches
+class RenditionTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.category = Category.objects.create(name="Drinks")
+
+    def test_every_size_and_format_is_written_next_to_the_original(self):
+        name = default_storage.save("food_item_pics/1_Shake.jpg", ContentFile(jpeg_bytes()))
+
+        written = generate_renditions(name)
+
+        self.assertEqual(sorted(written), sorted(rendition_names(name)))
+        with default_storage.open("food_item_pics/1_Shake.card.webp") as card:
+            image = Image.open(card)
+            self.assertEqual((image.format, image.size), ("WEBP", (600, 400)))
+        with default_storage.open("food_item_pics/1_Shake.thumb.jpg") as thumb:
+            self.assertEqual(Image.open(thumb).size, (160, 120))
+
+    def test_small_originals_are_not_upscaled(self):
+        name = default_storage.save("food_item_pics/2_Tea.jpg", ContentFile(jpeg_bytes((300, 300))))
+        generate_renditions(name)
+        with default_storage.open("food_item_pics/2_Tea.card.jpg") as card:
+            self.assertEqual(Image.open(card).size, (300, 200))
+
+    def test_unreadable_image_gets_no_renditions(self):
+        name = default_storage.save("food_item_pics/3_Broken.jpg", ContentFile(b"not an image"))
+        with self.assertLogs('orders.renditions', 'WARNING'):
+            self.assertEqual(generate_renditions(name), [])
+
+    def test_picture_tag_falls_back_to_the_original(self):
+        item = FoodItem.objects.create(
+            name="Shake", price=4, description="Cold", category=self.category,
+            image=default_storage.save("food_item_pics/4_Shake.jpg", ContentFile(jpeg_bytes())),
+        )
+        template = Template('{% load renditions %}{% picture item.image "card" item.name %}')
+
+        self.assertIn('src="/media/food_item_pics/4_Shake.jpg"', template.render(Context({'item': item})))
+        generate_renditions(item.image.name)
+        html = template.render(Context({'item': item}))
+        self.assertIn('srcset="/media/food_item_pics/4_Shake.card.webp"', html)
+        self.assertIn('src="/media/food_item_pics/4_Shake.card.jpg"', html)
+
+    def test_staff_upload_generates_renditions(self):
+        User.objects.create_user(username="staff", password="secret", is_staff=True)
+        self.client.login(username="staff", password="secret")
+        self.client.post(reverse('orders:add_food_item'), {
+            'name': "Latte", 'price': 3, 'description': "Milky", 'category': self.category.id,
+            'image': SimpleUploadedFile("latte.jpg", jpeg_bytes(), content_type="image/jpeg"),
+        })
+
+        item = FoodItem.objects.get(name="Latte")
+        self.assertTrue(has_renditions(item.image.name))
+
+    def test_backfill_command_skips_images_already_done(self):
+        for i in range(3):
+            FoodItem.objects.create(
+                name=f"Shake {i}", price=4, description="Cold", category=self.category,
+                image=default_storage.save(f"food_item_pics/{i}_Shake.jpg", ContentFile(jpeg_bytes())),
+            )
+        generate_renditions("food_item_pics/0_Shake.jpg")
+
+        # Threads stand in for the process pool so the workers see this test's MEDIA_ROOT
+        def thread_pool(max_workers, mp_context, initializer):
+            return ThreadPoolExecutor(max_workers)
+
+        with mock.patch('orders.management.commands.generate_renditions.ProcessPoolExecutor', thread_pool):
+            out = io.StringIO()
+            call_command('generate_renditions', workers=2, stdout=out)
+
+        self.assertIn("2 of 2 images processed", out.getvalue())
+        self.assertTrue(all(has_renditions(f"food_item_pics/{i}_Shake.jpg") for i in range(3)))
+
+
+@use_test_caches
+class ContentHashStorageTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.category = Category.objects.create(name="Drinks")
+        self.storage = food_image_storage()
+
+    def dish(self, name, image):
+        item = FoodItem(name=name, price=4, description="Cold", category=self.category)
+        item.image.save(image.name, image, save=False)
+        item.save()
+        return item
+
+    def age(self, name):
+        """Move `name` past the release grace period, as if uploaded long ago."""
+        past = time.time() - RELEASE_GRACE_PERIOD - 1
+        os.utime(self.storage.path(name), (past, past))
+        caches['default'].delete(reuse_key(name))
+
+    def test_identical_uploads_share_one_hashed_file(self):
+        first = self.dish("Shake", SimpleUploadedFile("shake.JPG", jpeg_bytes()))
+        second = self.dish("Shake 2", SimpleUploadedFile("other.jpg", jpeg_bytes()))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed(first.image.name))
+        self.assertTrue(first.image.name.endswith(".jpg"))
+        self.assertEqual(os.listdir(os.path.dirname(first.image.path)), [os.path.basename(first.image.path)])
+
+    def test_file_is_deleted_with_its_last_reference(self):
+        first = self.dish("Shake", SimpleUploadedFile("shake.jpg", jpeg_bytes()))
+        second = self.dish("Shake 2", SimpleUploadedFile("shake.jpg", jpeg_bytes()))
+        generate_renditions(first.image.name)
+        self.age(first.image.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(self.storage.exists(second.image.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(self.storage.exists(second.image.name))
+        self.assertFalse(any(self.storage.exists(name) for name in rendition_names(second.image.name)))
+
+    def test_replaced_image_is_released(self):
+        item = self.dish("Shake", SimpleUploadedFile("shake.jpg", jpeg_bytes(color="pink")))
+        old_name = item.image.name
+        self.age(old_name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.image.save("new.jpg", SimpleUploadedFile("new.jpg", jpeg_bytes(color="brown")))
+
+        self.assertNotEqual(item.image.name, old_name)
+        self.assertFalse(self.storage.exists(old_name))
+
+    def test_release_keeps_a_file_reused_by_an_uncommitted_upload(self):
+        item = self.dish("Shake", SimpleUploadedFile("shake.jpg", jpeg_bytes()))
+        name = item.image.name
+        self.age(name)
+
+        modified = os.path.getmtime(item.image.path)
+
+        # Another request stores the same bytes but has not saved its dish yet
+        self.assertEqual(self.storage.save("food_item_pics/again.jpg", ContentFile(jpeg_bytes())), name)
+        self.assertEqual(os.path.getmtime(item.image.path), modified)  # Last-Modified stays put
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertTrue(self.storage.exists(name))
+
+        self.age(name)
+        call_command('hash_media', '--prune', stdout=io.StringIO())
+        self.assertFalse(self.storage.exists(name))
+
+    def test_upload_rewrites_a_file_released_meanwhile(self):
+        item = self.dish("Shake", SimpleUploadedFile("shake.jpg", jpeg_bytes()))
+        os.remove(item.image.path)
+
+        self.assertEqual(self.storage.save("food_item_pics/again.jpg", ContentFile(jpeg_bytes())), item.image.name)
+        self.assertTrue(self.storage.exists(item.image.name))
+
+    def test_hash_media_rewrites_legacy_paths(self):
+        for name in ("6_Milkshake2.jpg", "9_Milkshake.jpg"):
+            default_storage.save(f"food_item_pics/{name}", ContentFile(jpeg_bytes()))
+            FoodItem.objects.create(name=name, price=4, description="Cold", category=self.category, image=f"food_item_pics/{name}")
+
+        call_command('hash_media', stdout=io.StringIO())
+
+        names = set(FoodItem.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertTrue(is_hashed(names.pop()))
+        self.assertFalse(default_storage.exists("food_item_pics/6_Milkshake2.jpg"))
+
+    def test_hashed_media_is_served_as_immutable(self):
+        item = self.dish("Shake", SimpleUploadedFile("shake.jpg", jpeg_bytes()))
+        default_storage.save("food_item_pics/legacy.jpg", ContentFile(jpeg_bytes()))
+
+        card = generate_renditions(item.image.name)[0]
+
+        response = self.client.get(item.image.url)
+        self.assertEqual(response["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+        response = self.client.get("/media/food_item_pics/legacy.jpg")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        # Renditions are rewritten in place by generate_renditions --force: revalidated by content ETag
+        response = self.client.get(f"/media/{card}")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertNotEqual(response["ETag"], f'"{os.path.basename(card)}"')
+
+
+@use_test_caches
+class MediaServingTests(SimpleTestCase):
+    body = bytes(range(256)) * 40
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        default_storage.save("food_item_pics/menu.jpg", ContentFile(self.body))
+        self.url = "/media/food_item_pics/menu.jpg"
+
+    def test_full_response_has_validators(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.body)
+        self.assertEqual(response["Content-Length"], str(len(self.body)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertTrue(response["ETag"].startswith('"') and not response["ETag"].startswith('W/'))
+        self.assertIn("Last-Modified", response)
+
+    def test_conditional_requests_get_304(self):
+        first = self.client.get(self.url)
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_etag_is_hashed_once(self):
+        self.client.get(self.url)
+        with mock.patch('orders.media_serving.hashlib.sha256') as sha256:
+            self.client.get(self.url)
+        sha256.assert_not_called()
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), self.body[100:200])
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.body)}")
+        self.assertEqual(response["Content-Length"], "100")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-10")
+        self.assertEqual(b"".join(response.streaming_content), self.body[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.body)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.body)}")
+
+    def test_stale_if_range_gets_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_head_and_missing_files(self):
+        response = self.client.head(self.url)
+        self.assertEqual((response.status_code, response.content), (200, b""))
+        self.assertEqual(response["Content-Length"], str(len(self.body)))
+
+        self.assertEqual(self.client.get("/media/food_item_pics/nope.jpg").status_code, 404)
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+
+    def test_only_public_media_is_served(self):
+        default_storage.save("menu_imports/menu.xlsx", ContentFile(self.body))
+        default_storage.save("restaurant_logo.png", ContentFile(self.body))
+
+        self.assertEqual(self.client.get("/media/menu_imports/menu.xlsx").status_code, 404)
+        self.assertEqual(self.client.get("/media/food_item_pics/../menu_imports/menu.xlsx").status_code, 404)
+        self.assertEqual(self.client.get("/media/restaurant_logo.png").status_code, 200)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    @override_settings(MEDIA_OFFLOAD='x-accel-redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_offload_to_front_proxy(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/food_item_pics/menu.jpg")
+        self.assertEqual(response.content, b"")
+        self.assertIn("ETag", response)
+
+        response = self.client.get("/media/food_item_pics/other/../menu.jpg")
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/food_item_pics/menu.jpg")
+
+
+@use_test_caches
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="customer", password="secret")
+        category = Category.objects.create(name="Pizza")
+        cls.items = [
+            FoodItem.objects.create(name=f"Pizza {i}", price=5 + i, description="Hot", category=category, is_vegetarian=i % 2 == 0)
+            for i in range(8)
+        ]
+
+    def test_views_are_coroutines(self):
+        for view in (views.add_to_cart, views.cart_api, views.menu_api):
+            self.assertTrue(asyncio.iscoroutinefunction(view))
+
+    def test_menu_api_pages_and_filters(self):
+        data = self.client.get(reverse('orders:menu_api'), {'vegetarian': 'true'}).json()
+
+        self.assertEqual([item['name'] for item in data['items']], ["Pizza 0", "Pizza 2", "Pizza 4", "Pizza 6"])
+        self.assertEqual(data['items'][0]['price'], "5.00")
+        self.assertFalse(data['has_next'])
+
+        data = self.client.get(reverse('orders:menu_api'), {'page': 2}).json()
+        self.assertEqual((data['page'], len(data['items']), data['has_next']), (2, 2, False))
+
+    def test_menu_api_is_cached(self):
+        self.client.get(reverse('orders:menu_api'))
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('orders:menu_api'))
+        self.assertFalse([query for query in context if 'orders_fooditem' in query['sql']])
+
+    def test_async_summary_matches_sync(self):
+        self.client.login(username="customer", password="secret")
+        self.client.post(reverse('orders:add_to_cart', args=[self.items[1].id]), {'quantity': 3})
+        self.client.post(reverse('orders:add_to_cart', args=[self.items[2].id]))
+
+        cart = DatabaseCart(RequestFactory().get('/'), self.user)
+        self.assertEqual(async_to_sync(cart.asummary)(), cart.summary())
+        self.assertEqual(self.client.get(reverse('orders:cart_api')).json()['cart_count'], 2)
+
+    def test_add_to_cart_rejects_unknown_dish_and_wrong_method(self):
+        self.assertEqual(self.client.post(reverse('orders:add_to_cart', args=[0])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('orders:cart_api')).status_code, 405)
+
+
+@use_test_caches
+class OrderStatusStreamTests(OrderFixtures, TestCase):
+    def setUp(self):
+        for name, value in (('STREAM_MAX_DURATION', 0.05), ('STREAM_POLL_INTERVAL', 0.01)):
+            patcher = mock.patch.object(order_stream, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def set_status(self, order, status):
+        order.status = status
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+
+    def read_stream(self, headers=None):
+        async def read():
+            response = await self.async_client.get(reverse('orders:order_status_stream'), headers=headers)
+            return response, "".join([chunk.decode() async for chunk in response.streaming_content])
+        return async_to_sync(read)()
+
+    def test_status_changes_are_published(self):
+        start = order_stream.last_event_id(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):  # Events are published on commit
+            order = place_order(self.user)
+            place_order(self.other)
+        self.set_status(order, 'Cancelled')
+        order.save()  # Same status again: nothing new to publish
+
+        events, newest = async_to_sync(order_stream.aevents_after)(self.user.id, start)
+        self.assertEqual([(event['id'], event['status']) for event in events], [(start + 1, 'Pending'), (start + 2, 'Cancelled')])
+        self.assertEqual(newest, start + 2)
+
+    def test_sequence_restarts_above_culled_ids(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = place_order(self.user).id
+        seen = order_stream.last_event_id(self.user.id)
+        caches['default'].delete(order_stream.sequence_key(self.user.id))
+
+        self.assertEqual(async_to_sync(order_stream.aevents_after)(self.user.id, seen), ([], seen))
+        self.set_status(Order.objects.get(id=first), 'Cancelled')
+        self.assertGreater(order_stream.last_event_id(self.user.id), seen)
+
+    def test_clashing_ids_are_redrawn(self):
+        start = order_stream.last_event_id(self.user.id)
+        # A concurrent publisher drew the same id and stored its event first
+        caches['default'].add(order_stream.event_key(self.user.id, start + 1), {"id": start + 1, "status": "Pending"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user, status='Preparing')
+
+        events, _ = async_to_sync(order_stream.aevents_after)(self.user.id, start)
+        self.assertEqual([event['status'] for event in events], ['Pending', 'Preparing'])
+
+    def test_stream_replays_after_last_event_id(self):
+        start = order_stream.last_event_id(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = place_order(self.user)
+        self.set_status(order, 'Completed')
+        self.async_client.force_login(self.user)
+
+        response, body = self.read_stream({'Last-Event-ID': str(start + 1)})
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertNotIn(f'id: {start + 1}\n', body)
+        self.assertIn(f'id: {start + 2}\nevent: status\n', body)
+        self.assertIn('"status": "Completed"', body)
+
+    def test_new_stream_starts_at_the_newest_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user)
+        self.async_client.force_login(self.user)
+
+        response, body = self.read_stream()
+
+        self.assertEqual(body, f"retry: {order_stream.STREAM_RETRY_MS}\n\n")
+
+    def test_stream_asks_for_reload_when_behind_the_buffer(self):
+        start = order_stream.last_event_id(self.user.id)
+        with mock.patch.object(order_stream, 'STREAM_BUFFER_SIZE', 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(3):
+                    place_order(self.user)
+            self.async_client.force_login(self.user)
+            response, body = self.read_stream({'Last-Event-ID': str(start)})
+
+        self.assertIn(f'id: {start + 3}\nevent: reset\n', body)
+        self.assertNotIn('event: status', body)
+
+    def test_stream_asks_for_reload_when_the_sequence_went_back(self):
+        newest = order_stream.last_event_id(self.user.id)
+        self.async_client.force_login(self.user)
+
+        response, body = self.read_stream({'Last-Event-ID': str(newest + 5)})
+
+        self.assertIn(f'id: {newest}\nevent: reset\n', body)
+
+    def test_history_page_embeds_last_event_id_and_stream_needs_login(self):
+        start = order_stream.last_event_id(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('orders:order_history'))
+        self.assertContains(response, f'?last_event_id={start + 1}')
+
+        async def stream():
+            return await self.async_client.get(reverse('orders:order_status_stream'))
+        self.assertEqual(async_to_sync(stream)().status_code, 401)
+
+
+@use_test_caches
+class CancelOrderTests(OrderFixtures, TestCase):
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_cancels_any_pending_order_by_id_with_one_update(self):
+        older, latest = place_order(self.user), place_order(self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            won, order = cancel_order(older.id, self.user)
+
+        self.assertTrue(won)
+        self.assertEqual(order.status, 'Cancelled')
+        statements = [query['sql'].split()[0] for query in context if query['sql'].split()[0] in ('SELECT', 'UPDATE', 'INSERT')]
+        self.assertEqual(statements, ['UPDATE', 'SELECT', 'INSERT'])  # The INSERT is the order event
+        latest.refresh_from_db()
+        self.assertEqual(latest.status, 'Pending')
+
+    def test_window_is_per_order(self):
+        expired = place_order(self.user, cancellable_until=cancel_deadline(-1))
+        open_order = place_order(self.user, cancellable_until=cancel_deadline(600))
+
+        self.assertEqual(cancel_order(expired.id, self.user)[0], False)
+        self.assertEqual(cancel_order(open_order.id, self.user)[0], True)
+
+    def test_loses_to_a_completed_or_cancelled_order(self):
+        order = place_order(self.user)
+        Order.objects.filter(id=order.id).update(status='Completed')  # The kitchen got there first
+
+        won, order = cancel_order(order.id, self.user)
+
+        self.assertFalse(won)
+        self.assertEqual(order.status, 'Completed')
+        order = place_order(self.user)
+        self.assertEqual([cancel_order(order.id)[0], cancel_order(order.id)[0]], [True, False])
+
+    def test_view_cancels_by_id_and_refuses_other_users_orders(self):
+        mine, theirs = place_order(self.user), place_order(self.other)
+        start = order_stream.last_event_id(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('orders:cancel_order', args=[mine.id]))
+        self.client.post(reverse('orders:cancel_order', args=[theirs.id]))
+
+        self.assertRedirects(response, reverse('orders:home'))
+        self.assertEqual(Order.objects.get(id=mine.id).status, 'Cancelled')
+        self.assertEqual(Order.objects.get(id=theirs.id).status, 'Pending')
+        events, _ = async_to_sync(order_stream.aevents_after)(self.user.id, start)
+        self.assertEqual(events[-1]['status'], 'Cancelled')
+
+    def test_view_without_id_cancels_latest_and_needs_post(self):
+        order = place_order(self.user)
+
+        self.assertEqual(self.client.get(reverse('orders:cancel_order')).status_code, 405)
+        self.client.post(reverse('orders:cancel_order'))
+
+        self.assertEqual(Order.objects.get(id=order.id).status, 'Cancelled')
+
+
+@use_test_caches
+class OrderLifecycleTests(OrderFixtures, TestCase):
+    def setUp(self):
+        self.order = place_order(self.user)
+
+    def events(self):
+        return list(OrderEvent.objects.filter(order=self.order).order_by('version').values_list('from_status', 'to_status', 'version'))
+
+    def test_admin_cannot_change_status_or_events(self):
+        admin_user = User.objects.create_superuser(username="admin", password="secret")
+        self.client.force_login(admin_user)
+        record_event(self.order, '')
+
+        response = self.client.get(reverse('admin:orders_order_change', args=[self.order.id]))
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        for field in ('status', 'version', 'events-0-to_status', 'events-0-DELETE'):
+            self.assertNotIn(f'name="{field}"', content)
+        self.assertContains(response, 'events-TOTAL_FORMS')  # The log is listed, read-only
+        self.assertNotIn(OrderEvent, admin.site._registry)
+
+    def test_admin_deletes_an_order_with_its_events(self):
+        admin_user = User.objects.create_superuser(username="admin", password="secret")
+        self.client.force_login(admin_user)
+        record_event(self.order, '')
+
+        response = self.client.post(reverse('admin:orders_order_delete', args=[self.order.id]), {'post': 'yes'})
+
+        self.assertRedirects(response, reverse('admin:orders_order_changelist'))
+        self.assertFalse(Order.objects.filter(id=self.order.id).exists())
+        self.assertFalse(OrderEvent.objects.exists())
+
+    def test_walks_the_lifecycle_and_logs_every_step(self):
+        for status in ('Preparing', 'Ready', 'Completed'):
+            order = transition(self.order.id, status, actor=self.staff)
+
+        self.assertEqual((order.status, order.version), ('Completed', 3))
+        self.assertEqual(self.events(), [('Pending', 'Preparing', 1), ('Preparing', 'Ready', 2), ('Ready', 'Completed', 3)])
+
+    def test_refuses_transitions_not_in_the_table(self):
+        with self.assertRaises(TransitionError) as raised:
+            transition(self.order.id, 'Completed')
+        self.assertNotIsInstance(raised.exception, StaleOrderError)
+        self.assertEqual(raised.exception.order.status, 'Pending')
+
+        transition(self.order.id, 'Cancelled')
+        with self.assertRaises(TransitionError):
+            transition(self.order.id, 'Preparing')
+
+    def test_stale_version_loses_without_overwriting(self):
+        transition(self.order.id, 'Preparing', expected_version=0)
+
+        with self.assertRaises(StaleOrderError) as raised:
+            transition(self.order.id, 'Cancelled', expected_version=0)
+
+        self.assertEqual((raised.exception.order.status, raised.exception.order.version), ('Preparing', 1))
+        self.assertEqual(Order.objects.get(id=self.order.id).status, 'Preparing')
+
+    def test_concurrent_change_between_read_and_write_is_detected(self):
+        real_filter = Order.objects.filter
+
+        def racing_filter(*args, **kwargs):
+            if 'version' in kwargs:  # The compare-and-swap: someone else moves the order first
+                Order.objects.filter(id=self.order.id).update(status='Cancelled', version=1)
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(Order.objects, 'filter', side_effect=racing_filter):
+            with self.assertRaises(StaleOrderError):
+                transition(self.order.id, 'Preparing')
+
+        self.assertEqual(self.events(), [])
+
+    def test_checkout_and_cancel_are_logged(self):
+        category = Category.objects.create(name="Soup")
+        item = FoodItem.objects.create(name="Tomato", price=3, description="Warm", category=category)
+        CartItem.objects.create(user=self.user, food_item=item, quantity=1)
+        self.client.force_login(self.user)
+        self.client.get(reverse('orders:place_order'))
+        order = Order.objects.latest('id')
+
+        cancel_order(order.id, self.user)
+
+        events = list(order.events.order_by('version').values_list('from_status', 'to_status', 'version', 'actor'))
+        self.assertEqual(events, [('', 'Pending', 0, self.user.id), ('Pending', 'Cancelled', 1, self.user.id)])
+
+    def test_kitchen_api_answers_conflicts_with_current_state(self):
+        self.client.force_login(self.staff)
+        url = reverse('orders:order_status_api', args=[self.order.id])
+
+        response = self.client.post(url, {'status': 'Preparing', 'version': 0})
+        self.assertEqual(response.json(), {'id': self.order.id, 'status': 'Preparing', 'version': 1})
+
+        response = self.client.post(url, {'status': 'Cancelled', 'version': 0})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.json()['status'], response.json()['version']), ('Preparing', 1))
+
+        self.assertEqual(self.client.post(url, {'status': 'Completed', 'version': 1}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('orders:order_status_api', args=[0]), {'status': 'Ready'}).status_code, 404)
+
+
+@use_test_caches
+class KitchenQueueTests(OrderFixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.soup = FoodItem.objects.create(name="Soup", price=5, description="Hot", category=Category.objects.create(name="Starters"))
+
+    def setUp(self):
+        patcher = mock.patch.object(kitchen, 'LONG_POLL_INTERVAL', 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_queue(self, **params):
+        async def get():
+            return await self.async_client.get(reverse('orders:kitchen_queue_api'), params)
+        return async_to_sync(get)()
+
+    def test_lists_open_orders_oldest_first_in_two_queries(self):
+        # Ready orders wait to be handed over: the kitchen completes them from the queue
+        first, done, second, cancelled, ready = [
+            place_order(self.user, [(self.soup, 2)], status=status)
+            for status in ('Pending', 'Completed', 'Preparing', 'Cancelled', 'Ready')
+        ]
+
+        with self.assertNumQueries(2):
+            queue = kitchen.build_queue()
+
+        self.assertEqual(
+            [(order['id'], order['status']) for order in queue],
+            [(first.id, 'Pending'), (second.id, 'Preparing'), (ready.id, 'Ready')],
+        )
+        self.assertEqual(queue[0]['lines'], [{"name": "Soup", "quantity": 2}])
+        self.assertEqual(queue[0]['customer'], "customer")
+
+    def test_queue_query_uses_an_index(self):
+        self.assertEqual(full_scans(kitchen.open_orders()), [])
+
+    def test_long_poll_answers_once_the_queue_changes(self):
+        self.async_client.force_login(self.staff)
+        data = self.get_queue().json()
+        self.assertEqual(data['orders'], [])
+
+        with mock.patch.object(kitchen, 'LONG_POLL_TIMEOUT', 0):
+            self.assertEqual(self.get_queue(since=data['version']).status_code, 204)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = place_order(self.user, [(self.soup, 2)])
+        changed = self.get_queue(since=data['version']).json()
+        self.assertNotEqual(changed['version'], data['version'])
+        self.assertEqual([item['id'] for item in changed['orders']], [order.id])
+
+    def test_transitions_wake_the_queue(self):
+        order = place_order(self.user, [(self.soup, 2)])
+        before = kitchen.queue_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition(order.id, 'Preparing')
+
+        self.assertNotEqual(kitchen.queue_version(), before)
+
+    def test_staff_only(self):
+        self.async_client.force_login(self.user)
+        self.assertEqual(self.get_queue().status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('orders:kitchen')).status_code, 302)
+
+        place_order(self.user, [(self.soup, 2)])
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('orders:kitchen'))
+        self.assertContains(response, 'kitchenQueueData')
+        self.assertEqual(len(response.context['queue']), 1)
+
+
+@use_test_caches
+class SalesRollupTests(OrderFixtures, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        category = Category.objects.create(name="Pizza")
+        cls.margherita = FoodItem.objects.create(name="Margherita", price=8, description="Classic", category=category)
+        cls.hour = now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+
+    def place(self, hours_ago, quantity=1, status='Pending'):
+        placed_at = self.hour - timedelta(hours=hours_ago) + timedelta(minutes=10)
+        return place_order(self.user, [(self.margherita, quantity)], status=status, created_at=placed_at)
+
+    def rollup(self, period, hours_ago=0):
+        return SalesRollup.objects.get(period=period, bucket_start=self.hour - timedelta(hours=hours_ago))
+
+    def test_rolls_up_hours_and_days(self):
+        self.place(0, quantity=2)
+        self.place(0, quantity=1, status='Cancelled')
+        self.place(1, quantity=3)
+
+        call_command('refresh_rollups', stdout=io.StringIO())
+
+        hour = self.rollup('hour')
+        self.assertEqual((hour.order_count, hour.cancelled_count, hour.items_sold, hour.revenue), (2, 1, 2, Decimal("16.00")))
+        self.assertEqual(self.rollup('hour', 1).items_sold, 3)
+        days = SalesRollup.objects.filter(period='day')
+        self.assertEqual(sum(day.order_count for day in days), 3)
+        self.assertEqual(sum(day.revenue for day in days), Decimal("40.00"))
+        item = ItemSalesRollup.objects.filter(period='day', item=self.margherita)
+        self.assertEqual(sum(row.quantity for row in item), 5)
+
+    def test_refresh_only_recomputes_changed_hours(self):
+        old = self.place(5)
+        self.place(0)
+        analytics.refresh_rollups()
+
+        self.assertEqual(analytics.refresh_rollups(), (0, 0))
+
+        cancel_order(old.id)  # Logged as an order event, which marks its hour dirty
+        self.assertEqual(analytics.refresh_rollups(), (1, 1))
+        self.assertEqual((self.rollup('hour', 5).cancelled_count, self.rollup('hour', 5).revenue), (1, 0))
+        self.assertEqual(self.rollup('hour').revenue, Decimal("8.00"))
+
+    def test_full_refresh_drops_rollups_of_deleted_orders(self):
+        order = self.place(0)
+        analytics.refresh_rollups()
+        order.delete()
+
+        analytics.refresh_rollups(full=True)
+
+        self.assertFalse(SalesRollup.objects.exists())
+
+    def test_dashboard_reads_only_rollups(self):
+        self.place(0, quantity=2)
+        self.place(0, status='Cancelled')
+        analytics.refresh_rollups()
+        self.client.force_login(self.staff)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('orders:analytics_dashboard'), {'period': 'hour', 'count': 24})
+
+        self.assertFalse([query for query in context if '"orders_order"' in query['sql'] or '"orders_orderhistory"' in query['sql']])
+        self.assertEqual(response.context['totals']['order_count'], 2)
+        self.assertEqual(response.context['totals']['cancellation_rate'], 0.5)
+        self.assertEqual(response.context['top_items'][0]['quantity'], 2)
+        self.assertEqual(response.context['categories'][0]['category_name'], "Pizza")
+        self.assertContains(response, "50%")
+
+    def test_dashboard_caps_the_range(self):
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse('orders:analytics_dashboard'), {'period': 'day', 'count': 10 ** 12})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['count'], views.ANALYTICS_RANGES['day'][1])
@@ -1,8 +1,6 @@
 from django.urls import path
 from .views import manage_menu,add_food_item, update_food_item, delete_food_item,home,CategoryMenuView
 from .views import *
-from django.conf import settings
-from django.conf.urls.static import static
 
 app_name = 'orders' 
 urlpatterns = [
@@ -14,16 +12,28 @@ urlpatterns = [
     path('menu/delete/<int:food_id>/', delete_food_item, name='delete_food_item'),
     path('', home, name='home'),
     path("category-menu/", CategoryMenuView.as_view(), name="cat_menu"),
+    path("menu/cache-stats/", menu_cache_stats_view, name="menu_cache_stats"),
+    path("menu/suggest/", menu_suggest, name="menu_suggest"),
+    path("api/menu/", menu_api, name="menu_api"),
     path('cart/', cart_view, name='cart'),
     path('add-to-cart/<int:food_id>/', add_to_cart, name='add_to_cart'),
-    path('remove-from-cart/<int:item_id>/', remove_from_cart, name='remove_from_cart'),
+    path('remove-from-cart/<int:food_id>/', remove_from_cart, name='remove_from_cart'),
+    path('api/cart/', cart_api, name='cart_api'),
+    path('api/cart/items/<int:food_id>/', cart_api_item, name='cart_api_item'),
     path('place-order/', place_order, name='place_order'),
     path('payment-success/', payment_success, name='payment_success'),
     path('cancel-order/', cancel_order, name='cancel_order'),
+    path('cancel-order/<int:order_id>/', cancel_order, name='cancel_order'),
+    path('orders/<int:order_id>/status/', order_status_api, name='order_status_api'),
+    path('kitchen/', kitchen, name='kitchen'),
+    path('kitchen/api/queue/', kitchen_queue_api, name='kitchen_queue_api'),
+    path('analytics/', analytics_dashboard, name='analytics_dashboard'),
     path('order-history/', order_history, name='order_history'),
+    path('order-history/stream/', order_status_stream, name='order_status_stream'),
     path("import-menu/", import_menu, name="import_menu"),
+    path("import-menu/jobs/<int:job_id>/", import_job_status, name="import_job_status"),
+    path("import-menu/jobs/<int:job_id>/upload/", import_job_file, {"kind": "upload"}, name="import_job_upload"),
+    path("import-menu/jobs/<int:job_id>/errors/", import_job_file, {"kind": "errors"}, name="import_job_errors"),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 
@@ -1,30 +1,42 @@
-import os
-import pandas as pd
+from datetime import timedelta
 from io import BytesIO
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.utils.timezone import now
 from django.core.files.base import ContentFile, File
-from django.core.files.storage import default_storage
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_GET, require_http_methods, require_safe
 from django.conf import settings
+from django.db import transaction
 
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
-
-from .models import FoodItem, Category, CartItem, Order, OrderHistory
+from .models import FoodItem, Category, Order, OrderHistory, MenuImportJob
 from .forms import FoodItemForm, MenuUploadForm, CategoryForm
 from .filters import FoodItemFilter
+from .analytics import sales_report
+from .cancellation import cancel_deadline, cancel_order as cancel_pending_order, refusal_reason
+from .cart import aget_cart, get_cart
+from .kitchen import await_queue_change, build_queue, queue_version
+from .lifecycle import StaleOrderError, TransitionError, record_event, transition
+from .history import build_history_feed
+from .menu_cache import aget_or_build, get_or_build, menu_cache_stats
+from .order_stream import last_event_id, status_stream
+from .import_jobs import enqueue_import, job_status
+from .media_serving import PRIVATE_CACHE_CONTROL, media_response
+from .facets import facet_counts
+from .pagination import SeekPage, aseek_page, seek_page
+from .renditions import generate_renditions, has_renditions
+from .suggest import suggest
 from django_filters.views import FilterView
-from django.core.paginator import Paginator
 
 @login_required
 def home(request):
-    categories = Category.objects.all()  # Fetch all categories
+    categories = get_or_build("categories", lambda: list(Category.objects.all()))
     return render(request, 'orders/home.html', {'categories': categories,'MEDIA_URL': settings.MEDIA_URL})
 
 class CategoryMenuView(FilterView):
@@ -34,24 +46,40 @@ class CategoryMenuView(FilterView):
     context_object_name = "food_items"
     paginate_by = 6
 
-    def get_queryset(self):
-        """Returns the filtered queryset."""
-        print(self.request.GET)
-        return self.filterset_class(self.request.GET, queryset=super().get_queryset()).qs
+    # FilterView applies FoodItemFilter to this once; the category is joined for the cards
+    queryset = FoodItem.objects.select_related('category').order_by('name', 'id')
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Serve the requested page from the menu cache, keyed on the filters and page number.
+        A miss costs a single LIMIT page_size + 1 query; no COUNT is needed for next/previous.
+        """
+        page_number = self.request.GET.get(self.page_kwarg)
 
-        # Apply pagination correctly
-        filtered_qs = self.get_queryset()
-        paginator = Paginator(filtered_qs, self.paginate_by)
-        page_number = self.request.GET.get("page")
-        page_obj = paginator.get_page(page_number)
+        def build():
+            page = seek_page(queryset, page_number, page_size)
+            return page.number, page.object_list, page.has_next()
 
-        context["page_obj"] = page_obj  # Standard name in Django CBVs
-        context["food_items"] = page_obj  # So it works with the existing loop
+        number, items, has_next = get_or_build("menu_page", build, self.request.GET)
+        page = SeekPage(items, number, has_next)
+        return None, page, items, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["food_items"] = context["page_obj"]  # So it works with the existing loop
+
+        # Facet counts come from the cached matrix; it has no text dimension, so none while searching
+        filterset = context["filter"]
+        if not filterset.is_bound:
+            data = {}  # No filters in the URL
+        elif filterset.is_valid():
+            data = filterset.form.cleaned_data
+        else:
+            data = None
+        if data is not None and not data.get("name"):
+            filterset.show_counts(facet_counts(data.get("category") or None, data.get("vegan"), data.get("vegetarian")))
         return context
-    
+
     # def get_context_data(self, **kwargs):
     #     context = super().get_context_data(**kwargs)
         
@@ -67,24 +95,58 @@ class CategoryMenuView(FilterView):
     #     return context
 
 
-# Cart
-@login_required
-def add_to_cart(request, food_id):
-    if request.method == "POST":
-        food_item = get_object_or_404(FoodItem, id=food_id)
-        quantity = int(request.POST.get("quantity", 1))
+def menu_item_json(item):
+    return {
+        "id": item.id,
+        "name": item.name,
+        "description": item.description,
+        "price": item.price,
+        "category": item.category.name,
+        "is_vegan": item.is_vegan,
+        "is_vegetarian": item.is_vegetarian,
+        "image": item.image.url if item.image else None,
+    }
 
-        cart_item, created = CartItem.objects.get_or_create(user=request.user, food_item=food_item)
+async def menu_api(request):
+    """One page of the filtered menu as JSON: the CategoryMenuView listing for async clients."""
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
 
-        if not created:
-            cart_item.quantity += quantity  # Increment existing quantity
-        else:
-            cart_item.quantity = quantity  # Set new quantity
+    # Building the filter form may load the category choices, which is sync cache/ORM work
+    queryset = await sync_to_async(lambda: FoodItemFilter(request.GET, queryset=CategoryMenuView.queryset).qs)()
+
+    async def build():
+        page = await aseek_page(queryset, request.GET.get("page"), CategoryMenuView.paginate_by)
+        return page.number, [menu_item_json(item) for item in page.object_list], page.has_next()
+
+    number, items, has_next = await aget_or_build("menu_api_page", build, request.GET)
+    return JsonResponse({"page": number, "has_next": has_next, "items": items})
 
-        cart_item.save()
 
-        # Count total items in cart
-        cart_count = CartItem.objects.filter(user=request.user).count()
+# Cart
+# Anonymous visitors can fill a session cart; they sign in at checkout (see get_cart)
+def parse_quantity(value):
+    """A positive int quantity from request data, or None."""
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity >= 1 else None
+
+# add_to_cart, cart_api and menu_api are async views: under ASGI (food_ordering.asgi) a slow
+# query no longer holds a worker thread. Django 4.2's method/login decorators are sync-only,
+# so they check the method themselves.
+async def add_to_cart(request, food_id):
+    if request.method == "POST":
+        food_item = await FoodItem.objects.only('name').filter(id=food_id).afirst()
+        if food_item is None:
+            raise Http404("No FoodItem matches the given query.")
+        quantity = parse_quantity(request.POST.get("quantity", 1))
+        if quantity is None:
+            return JsonResponse({"error": "Quantity must be a positive number"}, status=400)
+
+        cart = await aget_cart(request)
+        cart_count = await cart.aadd(food_item.id, quantity)
 
         return JsonResponse({
             "message": f"Added {food_item.name} to cart!",
@@ -93,93 +155,207 @@ def add_to_cart(request, food_id):
 
     return JsonResponse({"error": "Invalid request"}, status=400)
 
-@login_required
 def cart_view(request):
-    cart_items = CartItem.objects.filter(user=request.user)
-    total_amount = sum(item.total_price() for item in cart_items)
-    print("Cart Items:", cart_items)
+    summary = get_cart(request).summary()
     return render(request, 'orders/cart.html', {
-        'cart_items': cart_items,
-        'total_amount': total_amount
+        'cart_items': summary['lines'],
+        'total_amount': summary['total_amount']
     })
 
-@login_required
-def remove_from_cart(request, item_id):
-    cart_item = CartItem.objects.filter(user=request.user, id=item_id).first()
-
-    if cart_item:
-        cart_item.delete()
-        messages.success(request, "Item removed from cart!")
+def remove_from_cart(request, food_id):
+    get_cart(request).remove(food_id)
+    messages.success(request, "Item removed from cart!")
 
     return redirect('orders:cart')
 
+async def cart_api(request):
+    """The cart summary as JSON."""
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    cart = await aget_cart(request)
+    return JsonResponse(await cart.asummary())
+
+@require_http_methods(["POST", "DELETE"])
+def cart_api_item(request, food_id):
+    """POST sets a line's quantity, DELETE removes the line; both answer with the new summary."""
+    cart = get_cart(request)
+
+    if request.method == "DELETE":
+        cart.remove(food_id)
+        return JsonResponse(cart.summary())
+
+    quantity = parse_quantity(request.POST.get("quantity"))
+    if quantity is None:
+        return JsonResponse({"error": "Quantity must be a positive number"}, status=400)
+    if not cart.set_quantity(food_id, quantity):
+        return JsonResponse({"error": "Item is not in the cart"}, status=404)
+    return JsonResponse(cart.summary())
+
 @login_required
 def place_order(request):
-    cart_items = CartItem.objects.filter(user=request.user)
+    cart = get_cart(request)
 
-    if not cart_items.exists():
-        messages.error(request, "Your cart is empty.")
-        return redirect('orders:cart')
+    # The whole checkout is one unit of work: a crash leaves either no order or a complete one
+    with transaction.atomic():
+        # One joined read; the database cart locks its rows so a double submit cannot order twice
+        cart_items = cart.lines(for_update=True)
 
-    total_amount = sum(item.total_price() for item in cart_items)
-    
-    order = Order.objects.create(user=request.user, total_amount=total_amount,status= 'Completed')
-    # order.items.set(cart_items)
-    for cart_item in cart_items:
-        OrderHistory.objects.create(
-            order=order,
-            item=cart_item.food_item,
-            quantity=cart_item.quantity
-        )
+        if not cart_items:
+            messages.error(request, "Your cart is empty.")
+            return redirect('orders:cart')
 
+        # Lines snapshot name, category and price, so the order total never drifts from its lines
+        order = Order(user=request.user, status='Pending', cancellable_until=cancel_deadline())
+        order_lines = [OrderHistory.from_menu(order, cart_item.food_item, cart_item.quantity) for cart_item in cart_items]
+        order.total_amount = sum(line.total_price() for line in order_lines)
+        order.save()
+        record_event(order, '', request.user)
+        OrderHistory.objects.bulk_create(order_lines)
 
-    cart_items.delete()  # Empty the cart
+        # Empty the cart, leaving anything added after the read above untouched
+        cart.clear(cart_items)
 
     messages.success(request, "Your order has been placed successfully!")
-    return redirect('orders:payment_success')
+    return redirect(f"{reverse('orders:payment_success')}?{urlencode({'order': order.id})}")
 
 @login_required
 def payment_success(request):
-    return render(request, 'orders/payment_success.html')
+    order_id = request.GET.get('order', '')
+    return render(request, 'orders/payment_success.html', {'order_id': int(order_id) if order_id.isdigit() else None})
 
 @login_required
-def cancel_order(request):
-    print("Cancel Order View Called")  # Debugging
-
-    # Get the latest order of the user
-    order = Order.objects.filter(user=request.user).order_by('-created_at').first()
-
-    if not order:
-        messages.error(request, "No recent order found to cancel.")
-        return redirect('orders:home')
-
-    # Calculate time difference
-    time_elapsed = (now() - order.created_at).total_seconds()
-    print(f"Time elapsed since order placement: {time_elapsed} seconds")  # Debugging
+@require_http_methods(["POST"])
+def cancel_order(request, order_id=None):
+    if order_id is None:
+        # Older pages post without an id and mean the latest order
+        order_id = Order.objects.filter(user=request.user).order_by('-created_at').values_list('id', flat=True).first()
+        if order_id is None:
+            messages.error(request, "No recent order found to cancel.")
+            return redirect('orders:home')
+
+    cancelled, order = cancel_pending_order(order_id, request.user)
+    if cancelled:
+        messages.success(request, "Your order has been Cancelled successfully.")
+    else:
+        messages.error(request, refusal_reason(order))
+    return redirect('orders:home')
 
-    if time_elapsed > 120:  # 120 seconds = 2 minutes
-        messages.error(request, "Order cancellation time has expired.")
-        return redirect('orders:home')
+@staff_member_required
+@require_http_methods(["POST"])
+def order_status_api(request, order_id):
+    """
+    Kitchen actions: move an order to POST["status"]. POST["version"] is the
+    version the page showed; a conflict answers 409 with the current state
+    for the page to refresh from instead of overwriting someone else's change.
+    """
+    version = request.POST.get("version", "")
+    try:
+        order = transition(order_id, request.POST.get("status"), int(version) if version.isdigit() else None, request.user)
+    except Order.DoesNotExist:
+        raise Http404("No Order matches the given query.")
+    except TransitionError as error:
+        current = error.order
+        return JsonResponse({
+            "error": str(error),
+            "status": current.status if current else None,
+            "version": current.version if current else None,
+        }, status=409 if isinstance(error, StaleOrderError) else 400)
+    return JsonResponse({"id": order.id, "status": order.status, "version": order.version})
 
-    # Debugging before canceling
-    print(f"Canceling Order ID: {order.id}")
+@staff_member_required
+def kitchen(request):
+    version = queue_version()
+    return render(request, 'orders/kitchen.html', {'queue': build_queue(), 'queue_version': version})
+
+async def kitchen_queue_api(request):
+    """
+    The open orders as JSON. With ?since=<version> it long-polls: the request
+    waits until an order is placed or changes status (or LONG_POLL_TIMEOUT
+    passes, answered with 204) before querying anything.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    is_staff = await sync_to_async(lambda: request.user.is_active and request.user.is_staff)()
+    if not is_staff:
+        return JsonResponse({"error": "Staff only"}, status=403)
+
+    since = request.GET.get("since")
+    if since:
+        version = await await_queue_change(since)
+        if version is None:
+            return HttpResponse(status=204)
+    else:
+        version = await sync_to_async(queue_version)()
+    return JsonResponse({"version": str(version), "orders": await sync_to_async(build_queue)()})
 
-    order.status = 'Cancelled'
-    order.save()
-    # # Delete the order
-    # order.delete()
+# Default bucket count, most buckets asked for (90 days of hours, a year of days), bucket size
+ANALYTICS_RANGES = {'hour': (48, 24 * 90, timedelta(hours=1)), 'day': (30, 366, timedelta(days=1))}
 
-    messages.success(request, "Your order has been Cancelled successfully.")
-    return redirect('orders:home')
+@staff_member_required
+def analytics_dashboard(request):
+    # Reads the rollups only (manage.py refresh_rollups keeps them current), never the order tables
+    period = request.GET.get('period') if request.GET.get('period') in ANALYTICS_RANGES else 'day'
+    default_count, max_count, step = ANALYTICS_RANGES[period]
+    # Capped: a huge count would overflow the datetime arithmetic below
+    count = min(parse_quantity(request.GET.get('count', default_count)) or default_count, max_count)
+    end = now()
+    report = sales_report(period, end - count * step, end)
+    return render(request, 'orders/analytics.html', {'period': period, 'count': count, 'max_count': max_count, **report})
 
 @login_required
 def order_history(request):
-    # Fetch all orders placed by the logged-in user
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    unique_statuses = set(orders.values_list('status', flat=True))
-    print(unique_statuses)
+    # One page of orders per status tab; "after" is the keyset cursor of the tab being paged
+    active_status = request.GET.get("status")
+    cursors = {active_status: request.GET.get("after")} if active_status else {}
+    history = build_history_feed(request.user, cursors)
+
+    if history and active_status not in [group['status'] for group in history]:
+        active_status = history[0]['status']
+
+    return render(request, 'orders/order_history_copy.html', {
+        'history': history,
+        'active_status': active_status,
+        'last_event_id': last_event_id(request.user.id),
+    })
 
-    return render(request, 'orders/order_history_copy.html', {'orders': orders,'unique_statuses': unique_statuses,})
+async def order_status_stream(request):
+    """
+    Live status changes of the signed-in user's orders as server-sent events.
+    Needs an ASGI server (food_ordering.asgi): under WSGI every open stream
+    would hold a worker thread. Reconnects resume from Last-Event-ID.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    # Resolving the lazy request.user queries the session and user tables
+    user_id = await sync_to_async(lambda: request.user.id if request.user.is_authenticated else None)()
+    if user_id is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+
+    after = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        after = max(int(after), 0)
+    except (TypeError, ValueError):
+        after = await sync_to_async(last_event_id)(user_id)
+
+    response = StreamingHttpResponse(status_stream(user_id, after), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Stop nginx from buffering the events
+    return response
+
+@require_GET
+def menu_suggest(request):
+    """Search box typeahead, answered from this worker's in-memory index (no query per keystroke)."""
+    menu_url = reverse('orders:cat_menu')
+    suggestions = suggest(request.GET.get("q", ""))
+    for suggestion in suggestions:
+        param = "category" if suggestion["type"] == "category" else "name"
+        suggestion["url"] = f"{menu_url}?{urlencode({param: suggestion['label']})}"
+    return JsonResponse({"suggestions": suggestions})
+
+@staff_member_required
+def menu_cache_stats_view(request):
+    """Hit/miss counters of the menu cache for this worker."""
+    return JsonResponse(menu_cache_stats())
 
 @staff_member_required  
 def manage_menu(request):
@@ -218,140 +394,38 @@ def delete_category(request, category_id):
 
 @staff_member_required
 def import_menu(request):
+    """Queue the upload for the import worker; the page then polls import_job_status."""
     if request.method == "POST":
         form = MenuUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            file = request.FILES["file"]
-            error_file_path = os.path.join(settings.MEDIA_ROOT, "menu_errors.xlsx")
-            inserted_items = []
-            has_errors = False
-            error_log = []
-
-            try:
-                df = pd.read_excel(file)
-
-                expected_columns = ["Name", "Category", "Price", "Description", "Is_Vegetarian", "Is_Vegan", "Image_Path"]
-
-                # If file is empty
-                if df.empty:
-                    messages.error(request, "The uploaded file is empty.")
-                    return redirect("orders:import_menu")
-
-                # Identify missing or incorrect columns
-                missing_columns = [col for col in expected_columns if col not in df.columns]
-                extra_columns = [col for col in df.columns if col not in expected_columns]
-
-                try:
-                    wb = load_workbook(file)
-                    ws = wb.active  # First sheet
-                except:
-                    wb = Workbook()
-                    ws = wb.active
-                    for col_num, col_name in enumerate(df.columns, 1):
-                        ws.cell(row=1, column=col_num, value=col_name)
-
-                error_highlight = PatternFill(start_color="FF9999", end_color="FF9999", fill_type="solid")
-
-                # Highlight incorrect column names
-                for col_num, col_name in enumerate(df.columns, 1):
-                    if col_name in missing_columns or col_name in extra_columns:
-                        ws.cell(row=1, column=col_num).fill = error_highlight
-                        has_errors = True
-
-                if missing_columns or extra_columns:
-                    messages.error(request, f"Incorrect file format. Missing columns: {', '.join(missing_columns)}")
-                    messages.warning(request, f"Unexpected columns found: {', '.join(extra_columns)}")
-                    wb.save(error_file_path)
-                    return render(request, "orders/import_menu.html", {"form": form, "error_file": error_file_path})
-
-                # Define Expected Data Types
-                expected_dtypes = {
-                    "Name": str,
-                    "Category": str,
-                    "Price": (int, float),
-                    "Description": str,
-                    "Is_Vegetarian": bool,
-                    "Is_Vegan": bool,
-                }
-
-                # Validate row-wise data
-                for index, row in df.iterrows():
-                    row_num = index + 2  # Excel (1-based index + header row)
-                    error_found = False
-                    row_errors = []
-
-                    for col, expected_type in expected_dtypes.items():
-                        value = row.get(col, None)
-
-                        # Check for missing values
-                        if pd.isna(value):
-                            row_errors.append(f"{col} is missing")
-                            ws[f"{chr(65 + list(expected_dtypes.keys()).index(col))}{row_num}"].fill = error_highlight
-                            error_found = True
-                            continue
-
-                        # Check data type
-                        if not isinstance(value, expected_type):
-                            expected_type_name = (
-                                " or ".join(t.__name__ for t in expected_type)
-                                if isinstance(expected_type, tuple)
-                                else expected_type.__name__
-                            )
-                            row_errors.append(f"{col} must be {expected_type_name}")
-                            ws[f"{chr(65 + list(expected_dtypes.keys()).index(col))}{row_num}"].fill = error_highlight
-                            error_found = True
-
-                    # Validate category
-                    category, _ = Category.objects.get_or_create(name=row["Category"])
-
-                    # Check for duplicate entries
-                    exists = FoodItem.objects.filter(
-                        name=row["Name"], category=category, is_vegetarian=row["Is_Vegetarian"], is_vegan=row["Is_Vegan"]
-                    ).exists()
-
-                    if exists:
-                        row_errors.append(f"Duplicate entry: {row['Name']} in {row['Category']}")
-                        ws[f"A{row_num}"].fill = error_highlight
-                        error_found = True
-
-                    if error_found:
-                        error_log.append(f"Row {index+1}: {', '.join(row_errors)}")
-                        has_errors = True
-                        continue  # Skip inserting this row
-
-                    # Insert valid food item
-                    food_item = FoodItem(
-                        name=row["Name"],
-                        category=category,
-                        price=row["Price"],
-                        description=row["Description"],
-                        is_vegetarian=row["Is_Vegetarian"],
-                        is_vegan=row["Is_Vegan"],
-                    )
-                    food_item.save()
-                    inserted_items.append(food_item.name)
-
-                # Save error file if issues found
-                if has_errors:
-                    wb.save(error_file_path)
-                    messages.error(request, "Errors found in your file. Download the error file for details.")
-                    return render(request, "orders/import_menu.html", {"form": form, "error_file": error_file_path})
-
-                if inserted_items:
-                    messages.success(request, f"Inserted items: {', '.join(inserted_items)}")
-                else:
-                    messages.info(request, "No new food items were inserted.")
-
-                return render(request, "orders/import_menu.html", {"form": form})
-
-            except Exception as e:
-                messages.error(request, f"Error processing file: {str(e)}")
-                return redirect("orders:import_menu")
-
+            job = enqueue_import(request.FILES["file"], request.user)
+            messages.info(request, f"{job.original_name} has been queued for import.")
+            return redirect(f"{reverse('orders:import_menu')}?job={job.id}")
     else:
         form = MenuUploadForm()
 
-    return render(request, "orders/import_menu.html", {"form": form})
+    job_id = request.GET.get("job")
+    job = MenuImportJob.objects.filter(id=job_id).first() if job_id and job_id.isdigit() else None
+    return render(request, "orders/import_menu.html", {"form": form, "job": job})
+
+@staff_member_required
+def import_job_status(request, job_id):
+    """Progress of a queued menu import as JSON."""
+    job = get_object_or_404(MenuImportJob, id=job_id)
+    return JsonResponse(job_status(job))
+
+@staff_member_required
+@require_safe
+def import_job_file(request, job_id, kind):
+    """The uploaded spreadsheet or error report of a menu import; menu_imports/ is not public media."""
+    job = get_object_or_404(MenuImportJob, id=job_id)
+    if kind == "upload":
+        path, filename = job.file.name, job.original_name
+    else:
+        path, filename = job.error_file, f"errors_{job.original_name}"
+    if not path:
+        raise Http404("No such file for this import")
+    return media_response(request, path, cache_control=PRIVATE_CACHE_CONTROL, filename=filename)
 
 # @staff_member_required 
 # def import_menu(request):
@@ -622,27 +696,12 @@ def add_food_item(request):
         if form.is_valid():
             food_item = form.save(commit=False)  # Don't save to DB yet
 
-            if food_item.image and food_item.image.name != "food_item_pics/food_default.png":
-                ext = food_item.image.name.split('.')[-1]  # Get file extension
-                food_item.save()  # Save to assign an ID
-
-                # Generate new filename: id_name.ext
-                new_filename = f"food_item_pics/{food_item.id}_{food_item.name}.{ext}"
-
-                # Save the file with the new name
-                old_path = food_item.image.path  # Old file path
-                new_path = os.path.join(default_storage.location, new_filename)
-
-                # Rename file if old_path exists
-                if os.path.exists(old_path):
-                    os.rename(old_path, new_path)
-
-                # Update model with new file name
-                food_item.image.name = new_filename
-                food_item.save(update_fields=['image'])  # Save again to update image field
-            else:
+            if not food_item.image:
                 food_item.image = "food_item_pics/food_default.png"  # Ensure default image stays the same
-                food_item.save()
+            # Uploads are stored under their content hash, so the name never changes after this save
+            food_item.save()
+            if 'image' in form.changed_data and not has_renditions(food_item.image.name):
+                generate_renditions(food_item.image.name)
 
             return redirect('orders:manage_menu')  # Redirect to menu management page
     else:
@@ -658,6 +717,8 @@ def update_food_item(request, food_id):
         form = FoodItemForm(request.POST, request.FILES, instance=food_item)
         if form.is_valid():
             form.save()
+            if 'image' in form.changed_data and food_item.image and not has_renditions(food_item.image.name):
+                generate_renditions(food_item.image.name)
             return redirect('orders:manage_menu')
     else:
         form = FoodItemForm(instance=food_item)